@@ -35,6 +35,7 @@ RADAR_CFG_LIST = [
         'xlim'          : (-2, 2),         # Left-right limit
         'ylim'          : (0.2, 4.1),      # Depth limit (front of radar)
         'zlim'          : (0, 3.7),        # Height limit
+        'confidence_min': 0,               # Drop tracks below this confidence
         
         # Energy threshold (not used for 1010, but keep for compatibility)
         'ES_threshold'  : {'range': (0, None), 'speed_none_0_exception': False},
@@ -58,11 +59,16 @@ RADAR_CFG_LIST = [
     #     'xlim'          : (-3, 3),
     #     'ylim'          : (0.5, 8),
     #     'zlim'          : (0, 3),
+    #     'confidence_min': 0,
         
     #     'ES_threshold'  : {'range': (0, None), 'speed_none_0_exception': False},
     # },
 ]
 
+# Run all radar readers as threads inside one process instead of one process each
+# (the numba parse kernel and BLAS transform release the GIL, serial reads are IO-bound)
+RADAR_READER_THREADED = False
+
 # =============================================================================
 # SYNC MONITOR CONFIG
 # =============================================================================
@@ -90,6 +96,8 @@ VISUALIZER_CFG = {
     'VIS_zlim'                : (0, 3.7),
     
     'auto_inactive_skip_frame': 0,  # No skipping for tracking data
+    'VIS_redraw_period'       : 0.1,  # MatplotlibVisualizer (USE_MATPLOTLIB) only: seconds between 3D plot repaints, fused frames in between are skipped
+    'debug'                   : False,  # print the fused track table to the console every frame
     
     # Output settings
     'output_format'           : 'industrial_visualizer',  # or 'tlv', 'json'
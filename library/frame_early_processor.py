@@ -9,7 +9,6 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from collections import deque
 
 import numpy as np
-from matplotlib import pyplot as plt
 from numpy import sin, cos
 
 from library.data_processor import DataProcessor
@@ -65,14 +64,24 @@ class FrameEProcessor(DataProcessor):  # early processing for frame of each rada
         data_points, _ = self.DP_np_filter(data_points, axis=2, range_lim=self.zlim)
         return data_points
 
-    def FEP_trans_rotation_3D(self, data_points):
+    def FEP_boundary_idx_bool(self, data_points):
         """
-        update the data from radar based on its facing angle
+        :param data_points: (ndarray) data_numbers(n) * channels(c>3)
+        :return: preserved_index: (ndarray-bool) data_numbers(n), inside xlim, ylim and zlim
+        """
+        preserved_index, _ = self.DP_get_idx_bool(data_points, axis=0, range_lim=self.xlim)
+        preserved_index &= self.DP_get_idx_bool(data_points, axis=1, range_lim=self.ylim)[0]
+        preserved_index &= self.DP_get_idx_bool(data_points, axis=2, range_lim=self.zlim)[0]
+        return preserved_index
+
+    def FEP_rotation_matrix_3D(self, dtype=np.float64):
+        """
+        build the 4x4 homogeneous rotation matrix from the radar facing angle
         based on right-hand coord-sys (global coord-sys is used, means the xyz axes are frozen during rotation transformation),
         3 rotation matrices for xyz axes are used, default rotation sequence: dot matrix of z-axis first, followed by y and x-axis
 
-        :param data_points: (ndarray) data_numbers(n) * channels(3)
-        :return: (ndarray) data_numbers(n) * channels(3)
+        :param dtype: (np.dtype) dtype of the matrix
+        :return: (ndarray) 4 * 4
         """
         ref_point = (0, 0, 0)  # reference point, (0, 0, 0) by default not using
         rpx, rpy, rpz = ref_point
@@ -83,41 +92,38 @@ class FrameEProcessor(DataProcessor):  # early processing for frame of each rada
                        [0, cos(alpha), -sin(alpha), rpy * (1 - cos(alpha)) + rpz * sin(alpha)],
                        [0, sin(alpha), cos(alpha), rpz * (1 - cos(alpha)) - rpy * sin(alpha)],
                        [0, 0, 0, 1]],
-                      dtype=data_points.dtype)
+                      dtype=dtype)
         Ry = np.array([[cos(beta), 0, sin(beta), rpx * (1 - cos(beta)) - rpz * sin(beta)],
                        [0, 1, 0, 0],
                        [-sin(beta), 0, cos(beta), rpz * (1 - cos(beta)) + rpx * sin(beta)],
                        [0, 0, 0, 1]],
-                      dtype=data_points.dtype)
+                      dtype=dtype)
         Rz = np.array([[cos(gamma), -sin(gamma), 0, rpx * (1 - cos(gamma)) + rpy * sin(gamma)],
                        [sin(gamma), cos(gamma), 0, rpy * (1 - cos(gamma)) - rpx * sin(gamma)],
                        [0, 0, 1, 0],
                        [0, 0, 0, 1]],
-                      dtype=data_points.dtype)
-
-        # add one row of 1 to be compatible with matrices
-        data_points = np.concatenate([data_points, np.ones([data_points.shape[0], 1], dtype=data_points.dtype)], axis=1).T
+                      dtype=dtype)
 
         # choose rotation sequence
         if self.facing_angle['sequence'] == 'xyz':
-            data_points_transformed = np.dot(np.dot(np.dot(Rz, Ry), Rx), data_points)
+            R = np.dot(np.dot(Rz, Ry), Rx)
         elif self.facing_angle['sequence'] == 'xzy':
-            data_points_transformed = np.dot(np.dot(np.dot(Ry, Rz), Rx), data_points)
+            R = np.dot(np.dot(Ry, Rz), Rx)
         elif self.facing_angle['sequence'] == 'yxz':
-            data_points_transformed = np.dot(np.dot(np.dot(Rz, Rx), Ry), data_points)
+            R = np.dot(np.dot(Rz, Rx), Ry)
         elif self.facing_angle['sequence'] == 'yzx':
-            data_points_transformed = np.dot(np.dot(np.dot(Rx, Rz), Ry), data_points)
+            R = np.dot(np.dot(Rx, Rz), Ry)
         elif self.facing_angle['sequence'] == 'zxy':
-            data_points_transformed = np.dot(np.dot(np.dot(Ry, Rx), Rz), data_points)
+            R = np.dot(np.dot(Ry, Rx), Rz)
         else:  # default sequence is zyx
-            data_points_transformed = np.dot(np.dot(np.dot(Rx, Ry), Rz), data_points)
-        return data_points_transformed.T[:, 0:3]
+            R = np.dot(np.dot(Rx, Ry), Rz)
+        return R
 
-    def FEP_trans_position_3D(self, data_points):
+    def FEP_position_matrix_3D(self, dtype=np.float64):
         """
-        update the data from radar based on its position offset
-        :param data_points: (ndarray) data_numbers(n) * channels(3)
-        :return: (ndarray) data_numbers(n) * channels(3)
+        build the 4x4 homogeneous translation matrix from the radar position offset
+        :param dtype: (np.dtype) dtype of the matrix
+        :return: (ndarray) 4 * 4
         """
         dx, dy, dz = self.pos_offset  # tuple of distance for xyz axes
 
@@ -128,7 +134,37 @@ class FrameEProcessor(DataProcessor):  # early processing for frame of each rada
                       [0, 0, 1, dz],
                       [0, 0, 0, 1]
                     ],
-                     dtype=data_points.dtype)
+                     dtype=dtype)
+        return T
+
+    def FEP_affine_matrix_3D(self, dtype=np.float64):
+        """
+        rotation followed by translation fused into one 4x4 homogeneous matrix
+        :param dtype: (np.dtype) dtype of the matrix
+        :return: (ndarray) 4 * 4
+        """
+        return np.dot(self.FEP_position_matrix_3D(dtype), self.FEP_rotation_matrix_3D(dtype))
+
+    def FEP_trans_rotation_3D(self, data_points):
+        """
+        update the data from radar based on its facing angle
+        :param data_points: (ndarray) data_numbers(n) * channels(3)
+        :return: (ndarray) data_numbers(n) * channels(3)
+        """
+        R = self.FEP_rotation_matrix_3D(data_points.dtype)
+
+        # add one row of 1 to be compatible with matrices
+        data_points = np.concatenate([data_points, np.ones([data_points.shape[0], 1], dtype=data_points.dtype)], axis=1).T
+        data_points_transformed = np.dot(R, data_points)
+        return data_points_transformed.T[:, 0:3]
+
+    def FEP_trans_position_3D(self, data_points):
+        """
+        update the data from radar based on its position offset
+        :param data_points: (ndarray) data_numbers(n) * channels(3)
+        :return: (ndarray) data_numbers(n) * channels(3)
+        """
+        T = self.FEP_position_matrix_3D(data_points.dtype)
 
         # add one row of 1 to be compatible with matrices
         data_points = np.concatenate([data_points, np.ones([data_points.shape[0], 1], dtype=data_points.dtype)], axis=1).T
@@ -137,6 +173,8 @@ class FrameEProcessor(DataProcessor):  # early processing for frame of each rada
 
 
 if __name__ == '__main__':
+    from matplotlib import pyplot as plt  # demo only, radar processes do not load matplotlib
+
     RADAR_CFG = {'name'          : 'test',
                  'cfg_port_name' : 'COM3',
                  'data_port_name': 'COM4',
@@ -0,0 +1,175 @@
+"""
+Designed for the hot per-frame loops, compiled with Numba when available, abbr. JIT
+falls back to the Cython parser (jit_parser.pyx) or equivalent NumPy code if numba is not installed
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# TLV parser backend: 'numba', 'cython' (no JIT warm-up at start, needs Cython and a C compiler) or 'numpy'
+PARSE_BACKEND = 'numba'
+
+# TLV 1010 target record as 28 little-endian 32-bit words (112 bytes)
+TARGET_WORDS = 28
+WORD_TID = 0
+WORD_POS = 1
+WORD_VEL = 4
+WORD_ACC = 7
+WORD_CONFIDENCE = 27
+
+
+def _parse_targets_np(buf_u8, out_tid, out_pos, out_vel, out_acc, out_conf):
+    """
+    NumPy version of parse_targets, see below
+    """
+    n = min(buf_u8.shape[0] // (TARGET_WORDS * 4), out_tid.shape[0])
+    words_u = buf_u8[:n * TARGET_WORDS * 4].view('<u4').reshape(n, TARGET_WORDS)
+    words_f = words_u.view('<f4')
+    out_tid[:n] = words_u[:, WORD_TID]
+    out_pos[:n] = words_f[:, WORD_POS:WORD_POS + 3]
+    out_vel[:n] = words_f[:, WORD_VEL:WORD_VEL + 3]
+    out_acc[:n] = words_f[:, WORD_ACC:WORD_ACC + 3]
+    out_conf[:n] = words_f[:, WORD_CONFIDENCE]
+    return n
+
+
+def _load_cython_parser():
+    """
+    build (first import only) and load the Cython parser
+    :return: parse_targets function, or None if Cython or a compiler is missing
+    """
+    try:
+        import pyximport
+        pyximport.install(language_level=3)
+        from library.jit_parser import parse_targets as parse_targets_cy
+        return parse_targets_cy
+    except Exception:
+        return None
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, boundscheck=False, fastmath=True, nogil=True)  # nogil: reader threads parse in parallel
+    def _parse_targets_nb(buf_u8, out_tid, out_pos, out_vel, out_acc, out_conf):
+        """
+        decode TLV 1010 target records into preallocated output arrays
+        :param buf_u8: (ndarray) uint8, contiguous TLV 1010 payload
+        :param out_tid: (ndarray) uint32 (max_n,)
+        :param out_pos: (ndarray) float32 (max_n, 3)
+        :param out_vel: (ndarray) float32 (max_n, 3)
+        :param out_acc: (ndarray) float32 (max_n, 3)
+        :param out_conf: (ndarray) float32 (max_n,)
+        :return: n: (int) number of targets written
+        """
+        n = min(buf_u8.shape[0] // (TARGET_WORDS * 4), out_tid.shape[0])
+        words = buf_u8[:n * TARGET_WORDS * 4]
+        words_u = words.view(np.uint32)
+        words_f = words.view(np.float32)
+        for i in range(n):
+            base = i * TARGET_WORDS
+            out_tid[i] = words_u[base + WORD_TID]
+            for k in range(3):
+                out_pos[i, k] = words_f[base + WORD_POS + k]
+                out_vel[i, k] = words_f[base + WORD_VEL + k]
+                out_acc[i, k] = words_f[base + WORD_ACC + k]
+            out_conf[i] = words_f[base + WORD_CONFIDENCE]
+        return n
+
+    @njit(cache=True, boundscheck=False, fastmath=True, nogil=True)
+    def _group_tracks_nb(positions, distance_threshold):
+        """
+        greedy grouping of the tracks closer than distance_threshold, same rule as TrackFusion.fuse_tracks
+        :param positions: (ndarray) float64 (N, 3)
+        :param distance_threshold: (float) meters
+        :return: order: (ndarray) int64 (N,) row indices, group by group
+                 sizes: (ndarray) int64 (n_groups,) rows per group
+        """
+        n = positions.shape[0]
+        threshold_sq = distance_threshold * distance_threshold
+        merged = np.zeros(n, dtype=np.bool_)
+        close = np.empty(n, dtype=np.int64)
+        order = np.empty(n, dtype=np.int64)
+        sizes = np.empty(n, dtype=np.int64)
+        n_order = 0
+        n_groups = 0
+        for i in range(n):
+            if merged[i]:
+                continue
+            # neighbours of i, ascending, squared distance (no sqrt)
+            n_close = 0
+            for j in range(n):
+                dx = positions[i, 0] - positions[j, 0]
+                dy = positions[i, 1] - positions[j, 1]
+                dz = positions[i, 2] - positions[j, 2]
+                if dx * dx + dy * dy + dz * dz < threshold_sq:
+                    close[n_close] = j
+                    n_close += 1
+            n_free = 0
+            for k in range(n_close):
+                if not merged[close[k]]:
+                    order[n_order + n_free] = close[k]
+                    n_free += 1
+            if n_free > 1:
+                for k in range(n_close):
+                    merged[close[k]] = True
+            else:
+                order[n_order] = i
+                merged[i] = True
+                n_free = 1
+            sizes[n_groups] = n_free
+            n_order += n_free
+            n_groups += 1
+        return order, sizes[:n_groups]
+
+    @njit(cache=True, boundscheck=False, nogil=True)
+    def _group_neighbours_nb(bounds, close_idx):
+        """
+        greedy grouping as _group_tracks_nb, from a sparse neighbour table (KD-tree pairs) instead of positions
+        :param bounds: (ndarray) int64 (N + 1,) offsets into close_idx
+        :param close_idx: (ndarray) int64 neighbour row indices, ascending per row, row itself included
+        :return: order, sizes: see _group_tracks_nb
+        """
+        n = bounds.shape[0] - 1
+        merged = np.zeros(n, dtype=np.bool_)
+        order = np.empty(n, dtype=np.int64)
+        sizes = np.empty(n, dtype=np.int64)
+        n_order = 0
+        n_groups = 0
+        for i in range(n):
+            if merged[i]:
+                continue
+            n_free = 0
+            for k in range(bounds[i], bounds[i + 1]):
+                if not merged[close_idx[k]]:
+                    order[n_order + n_free] = close_idx[k]
+                    n_free += 1
+            if n_free > 1:
+                for k in range(bounds[i], bounds[i + 1]):
+                    merged[close_idx[k]] = True
+            else:
+                order[n_order] = i
+                merged[i] = True
+                n_free = 1
+            sizes[n_groups] = n_free
+            n_order += n_free
+            n_groups += 1
+        return order, sizes[:n_groups]
+
+# choose the parser, numba -> cython -> numpy
+_parse_targets_cy = None
+if PARSE_BACKEND == 'cython' or (PARSE_BACKEND == 'numba' and not NUMBA_AVAILABLE):
+    _parse_targets_cy = _load_cython_parser()
+if PARSE_BACKEND == 'numba' and NUMBA_AVAILABLE:
+    parse_targets = _parse_targets_nb
+elif _parse_targets_cy is not None:
+    parse_targets = _parse_targets_cy
+else:
+    parse_targets = _parse_targets_np
+
+# track grouping kernels, None without numba (TrackFusion then groups from a neighbour table in Python)
+group_tracks = _group_tracks_nb if NUMBA_AVAILABLE else None
+group_neighbours = _group_neighbours_nb if NUMBA_AVAILABLE else None
@@ -0,0 +1,44 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Designed for parsing TLV 1010 without JIT warm-up, abbr. JIT
+Cython twin of jit_kernels.parse_targets, built on first import by pyximport
+"""
+
+from libc.string cimport memcpy
+
+
+cdef struct Target:  # TLV 1010 target record, 112 bytes
+    unsigned int tid
+    float pos[3]
+    float vel[3]
+    float acc[3]
+    float ec[16]
+    float g
+    float conf
+
+
+def parse_targets(const unsigned char[::1] buf_u8, unsigned int[:] out_tid,
+                  float[:, :] out_pos, float[:, :] out_vel, float[:, :] out_acc, float[:] out_conf):
+    """
+    decode TLV 1010 target records into preallocated output arrays
+    :param buf_u8: (ndarray) uint8, contiguous TLV 1010 payload
+    :param out_tid: (ndarray) uint32 (max_n,)
+    :param out_pos: (ndarray) float32 (max_n, 3)
+    :param out_vel: (ndarray) float32 (max_n, 3)
+    :param out_acc: (ndarray) float32 (max_n, 3)
+    :param out_conf: (ndarray) float32 (max_n,)
+    :return: n: (int) number of targets written
+    """
+    cdef Py_ssize_t n = min(buf_u8.shape[0] // <Py_ssize_t>sizeof(Target), out_tid.shape[0])
+    cdef Py_ssize_t i, k
+    cdef Target t
+    with nogil:
+        for i in range(n):
+            memcpy(&t, &buf_u8[i * sizeof(Target)], sizeof(Target))  # payload is not 4-byte aligned
+            out_tid[i] = t.tid
+            for k in range(3):
+                out_pos[i, k] = t.pos[k]
+                out_vel[i, k] = t.vel[k]
+                out_acc[i, k] = t.acc[k]
+            out_conf[i] = t.conf
+    return n
@@ -1,32 +1,75 @@
 """
 Modified RadarReader for dual IWR6843AOP with TLV 1010 (3D People Tracking)
-Parses TLV 1010, transforms coordinates (like thesis FEP), then queues
+Parses TLV 1010, transforms coordinates (like thesis FEP), then publishes to a shared-memory ring
 """
 
+import atexit
+import logging
+import os
+import select
 import struct
 import time
 from datetime import datetime
+from threading import BrokenBarrierError
 import numpy as np
 import serial
 
 from library.frame_early_processor import FrameEProcessor
+from library.jit_kernels import parse_targets
+from library.rate_limiter import RateLimiter
+
+log = logging.getLogger(__name__)
 
 # TLV Header constants
 MAGIC_WORD = b'\x02\x01\x04\x03\x06\x05\x08\x07'
 HEADER_LENGTH = 40  # bytes (8 magic + 32 header info)
+DATA_BUFFER_SIZE = 262144  # bytes, preallocated receive buffer
+DATA_BUFFER_COMPACT = 131072  # bytes, move unread tail to the front once the read index passes this
+DATA_BUFFER_MAX_PENDING = 100000  # bytes, unread data beyond this is dropped as overflow
+DATA_READ_SIZE = 4096  # bytes, upper bound of one blocking serial read
+DATA_PORT_TIMEOUT = 0.01  # seconds, a read returns what has arrived after this
+CLI_PROMPT = b'mmwDemo:/>'  # CLI prompt that ends every command response on the cfg port
 
 # TLV Types for 3D People Tracking
 TLV_TYPE_TRACKER_PROC_TARGET_LIST = 1010  # 3D target list
 
+# TLV 1010 target record (112 bytes), parsed in bulk with np.frombuffer
+TARGET_DTYPE = np.dtype([('tid', '<u4'),
+                         ('pos', '<f4', (3,)),          # posX, posY, posZ
+                         ('vel', '<f4', (3,)),          # velX, velY, velZ
+                         ('acc', '<f4', (3,)),          # accX, accY, accZ
+                         ('ec', '<f4', (16,)),          # error covariance
+                         ('g', '<f4'),                  # gating gain
+                         ('confidence', '<f4')])
+
+# Fields kept from each target after parsing (error covariance and gating gain are dropped)
+TRACK_DTYPE = np.dtype([('tid', '<u4'),
+                        ('pos', '<f4', (3,)),
+                        ('vel', '<f4', (3,)),
+                        ('acc', '<f4', (3,)),
+                        ('confidence', '<f4')])
+TARGETS_MAX = 250  # tracker upper limit for maxNumTracks
+
+# Precompiled layouts for the frame header (after magic word) and the TLV header
+FRAME_HEADER_STRUCT = struct.Struct('<8I')
+TLV_HEADER_STRUCT = struct.Struct('<2I')
+PACKET_LEN_STRUCT = struct.Struct('<I')
+PACKET_LEN_OFFSET = len(MAGIC_WORD) + 4  # total_packet_len follows the version field
+
+# Frame parser states
+SEARCH_MAGIC = 0  # scanning for the next magic word
+READ_FRAME = 1  # aligned on a magic word, waiting for the full packet
+
 
 class RadarReader:
-    def __init__(self, run_flag, radar_rd_queue, shared_param_dict, **kwargs_CFG):
+    def __init__(self, run_flag, radar_ring, shared_param_dict, **kwargs_CFG):
         """
         Initialize radar reader for TLV 1010 parsing + transformation
         """
         self.run_flag = run_flag
-        self.radar_rd_queue = radar_rd_queue
+        self.radar_ring = radar_ring  # SharedTrackRing of TRACK_DTYPE, this radar's frames for the fuser
         self.status = shared_param_dict['proc_status_dict']
+        self.startup_barrier = shared_param_dict.get('startup_barrier')  # passed once the radar streams, None to skip
         
         # Get radar config
         RDR_CFG = kwargs_CFG['RADAR_CFG']
@@ -39,24 +82,53 @@ class RadarReader:
         
         # Frame Early Processor for coordinate transformation (like thesis)
         self.fep = FrameEProcessor(**kwargs_CFG)
+        self.confidence_min = RDR_CFG.get('confidence_min', 0)  # drop targets below this confidence
+        # Rotation + translation fused into one affine, built once (transposed for row-vector points)
+        affine = self.fep.FEP_affine_matrix_3D().astype(np.float32)
+        self._affine_T = np.ascontiguousarray(affine[:3, :].T)  # (4, 3), homogeneous points -> rotated + translated
+        self._rotation_T = np.ascontiguousarray(affine[:3, :3].T)  # (3, 3), vectors only rotate
+        self._translation = np.ascontiguousarray(affine[:3, 3])  # (3,)
+        # Specialize the transform once for radars at the origin and/or with default orientation
+        self._rotation_is_identity = np.allclose(affine[:3, :3], np.eye(3))
+        self._translation_is_zero = np.allclose(self._translation, 0)
         
         self.cfg_port = None
         self.data_port = None
+        self._data_fd = None  # POSIX: data port file descriptor, read directly with select + readv
+        
+        # Receive buffer, consumed by index instead of re-slicing a bytes object
+        self._buf = bytearray(DATA_BUFFER_SIZE)
+        self._buf_view = memoryview(self._buf)  # fixed-size buffer, one view shared by every read/parse slice
+        self._read_pos = 0
+        self._write_pos = 0
+        self._state = SEARCH_MAGIC
+        
+        # Parsed and transformed targets, reused across frames (the ring keeps its own copy)
+        self._targets = np.zeros(TARGETS_MAX, dtype=TRACK_DTYPE)
+        self._transformed = np.zeros(TARGETS_MAX, dtype=TRACK_DTYPE)
+        self._pos_h = np.ones((TARGETS_MAX, 4), dtype=np.float32)  # homogeneous positions, last column stays 1
         
         # Statistics
         self.frame_count = 0
         self.parse_errors = 0
+        self._exc_ratelimit = RateLimiter(every=5.0)  # malformed frames can fail every iteration
         
-        self._log('Initialized for TLV 1010 - Parse → Transform → Queue')
+        # Explicit cleanup instead of a finalizer, see close()
+        self._closed = False
+        atexit.register(self.close)
+        
+        self._log('Initialized for TLV 1010 - Parse → Transform → Ring')
 
     def connect(self) -> bool:
         """Connect to radar COM ports"""
         try:
             self.cfg_port = serial.Serial(self.cfg_port_name, baudrate=115200, timeout=1)
-            self.data_port = serial.Serial(self.data_port_name, baudrate=921600, timeout=1)
+            self.data_port = serial.Serial(self.data_port_name, baudrate=921600, timeout=DATA_PORT_TIMEOUT)
             
             if not (self.cfg_port.is_open and self.data_port.is_open):
                 raise serial.SerialException("Ports not opened")
+            if os.name == 'posix':
+                self._data_fd = self.data_port.fileno()
             
             self._log(f'Connected: CFG={self.cfg_port_name}, DATA={self.data_port_name}')
             # Send configuration (optional - radar should already be configured)
@@ -71,100 +143,149 @@ class RadarReader:
             self._log(f'Connection failed: {e}')
             return False
     def run(self):
-        """Main loop - read, parse TLV 1010, transform, queue (like thesis)"""
+        """Main loop - read, parse TLV 1010, transform, publish (like thesis)"""
         if not self.connect():
             self._log(f"Radar {self.name} Connection Failed")
             self.run_flag.value = False
+            if self.startup_barrier is not None:
+                self.startup_barrier.abort()  # release the modules waiting for this radar
             return
 
-        data_buffer = b''
+        # Wait until every module is set up, the radars start reading together
+        if self.startup_barrier is not None:
+            try:
+                self.startup_barrier.wait()
+            except BrokenBarrierError:
+                pass  # another module failed or timed out, run_flag decides whether to go on
+
         self._log('Starting data acquisition...')
         
         while self.run_flag.value:
             try:
-                # Read available data
-                bytes_available = self.data_port.in_waiting
-                if bytes_available > 0:
-                    data_buffer += self.data_port.read(bytes_available)
+                # Blocking read straight into the receive buffer, returns early on timeout
+                self._fill_buffer(DATA_READ_SIZE)
                 
-                # Look for complete frame (at least 2 magic words)
-                if data_buffer.count(MAGIC_WORD) >= 2:
-                    # Find first magic word
-                    start_idx = data_buffer.find(MAGIC_WORD)
-                    if start_idx == -1:
-                        continue
-                    
-                    # Extract frame starting from magic word
-                    frame_data = data_buffer[start_idx:]
-                    
-                    # Parse the frame to get tracks
-                    tracks_list, frame_number, frame_length = self._parse_tlv_1010_frame(frame_data)
-                    
-                    if tracks_list is not None and len(tracks_list) > 0:
-                        try:
-                            # Convert tracks to numpy array (like thesis point cloud format)
-                            # Each track: [posX, posY, posZ, velX, velY, velZ, accX, accY, accZ, confidence, tid]
-                            track_array = self._tracks_to_array(tracks_list)
-                            
-                            # Apply coordinate transformation (rotation + translation) like thesis FEP
-                            transformed_tracks = self._transform_tracks(track_array)
-                            
-                            # Put transformed tracks into queue (like thesis)
-                            frame_dict = {
-                                'radar_name': self.name,
-                                'frame_number': frame_number,
-                                'num_tracks': len(tracks_list),
-                                'tracks': transformed_tracks,  # Transformed tracks (list of dicts)
-                                'timestamp': time.time()
-                            }
-                            
-                            self.radar_rd_queue.put(frame_dict)
-                            
-                        except Exception as e:
-                            self._log(f'Transform error: {e}')
-                            pass
-                        
-                        self.frame_count += 1
-                        
-                        if self.frame_count % 100 == 0:
-                            self._log(f'Frames: {self.frame_count}, Tracks: {len(tracks_list)}, Errors: {self.parse_errors}')
-                    
-                    # Remove processed frame from buffer
-                    if frame_length > 0:
-                        data_buffer = data_buffer[start_idx + frame_length:]
-                    else:
-                        data_buffer = data_buffer[start_idx + len(MAGIC_WORD):]
+                # Parse every complete frame already sitting in the buffer
+                frame_data = self._next_frame()
+                while frame_data is not None:
+                    self._process_frame(frame_data)
+                    frame_data = self._next_frame()
                 
                 # Prevent buffer overflow
-                if len(data_buffer) > 100000:
+                if self._write_pos - self._read_pos > DATA_BUFFER_MAX_PENDING:
                     self._log(f'Warning: Buffer overflow, clearing')
-                    data_buffer = b''
+                    self._read_pos = self._write_pos = 0
+                    self._state = SEARCH_MAGIC
                     
             except Exception as e:
-                self._log(f'Error in main loop: {e}')
+                self._log_exception('Error in main loop: %s', e)
                 self.parse_errors += 1
                 time.sleep(0.01)
 
+    def _fill_buffer(self, size):
+        """Read up to size bytes from the data port into the free tail of the receive buffer"""
+        if self._read_pos >= DATA_BUFFER_COMPACT or self._write_pos + size > len(self._buf):
+            self._compact_buffer()
+        size = min(size, len(self._buf) - self._write_pos)
+        view = self._buf_view[self._write_pos:self._write_pos + size]
+        if self._data_fd is None:
+            n = self.data_port.readinto(view)
+        else:
+            # One select + one readv of whatever has arrived, no intermediate bytes object
+            # (pyserial's read loops until size or timeout and copies through a bytearray)
+            ready, _, _ = select.select([self._data_fd], [], [], DATA_PORT_TIMEOUT)
+            if not ready:
+                return
+            try:
+                n = os.readv(self._data_fd, [view])
+            except BlockingIOError:
+                return
+            if n == 0:
+                raise serial.SerialException('device reports readiness to read but returned no data')
+        self._write_pos += n or 0
+
+    def _compact_buffer(self):
+        """Move the unread bytes to the front of the receive buffer (in-place memmove)"""
+        pending = self._write_pos - self._read_pos
+        if pending > 0:
+            self._buf_view[:pending] = self._buf_view[self._read_pos:self._write_pos]
+        self._read_pos = 0
+        self._write_pos = pending
+
+    def _next_frame(self):
+        """
+        Advance the parser state machine over the unread bytes
+        Returns: memoryview of one complete frame, or None if more data is needed
+        """
+        while True:
+            if self._state == SEARCH_MAGIC:
+                if self._buf.startswith(MAGIC_WORD, self._read_pos, self._write_pos):
+                    idx = self._read_pos  # in sync, the previous frame ended right on the next magic word
+                else:
+                    idx = self._buf.find(MAGIC_WORD, self._read_pos, self._write_pos)
+                if idx == -1:
+                    # Keep a possible partial magic word at the tail, drop the rest
+                    self._read_pos = max(self._read_pos, self._write_pos - len(MAGIC_WORD) + 1)
+                    return None
+                self._read_pos = idx
+                self._state = READ_FRAME
+
+            # READ_FRAME: peek total_packet_len once the header is in, then wait for the whole packet
+            pending = self._write_pos - self._read_pos
+            if pending < HEADER_LENGTH:
+                return None
+            total_packet_len, = PACKET_LEN_STRUCT.unpack_from(self._buf, self._read_pos + PACKET_LEN_OFFSET)
+            if total_packet_len < HEADER_LENGTH or total_packet_len > DATA_BUFFER_MAX_PENDING:
+                # Corrupt header, resync past this magic word
+                self.parse_errors += 1
+                self._read_pos += len(MAGIC_WORD)
+                self._state = SEARCH_MAGIC
+                continue
+            if pending < total_packet_len:
+                return None
+            return self._buf_view[self._read_pos:self._read_pos + total_packet_len]
+
+    def _process_frame(self, frame_data):
+        """Parse, transform and publish one complete frame, then consume it from the buffer"""
+        # Parse the frame to get tracks
+        tracks_list, frame_number, frame_length = self._parse_tlv_1010_frame(frame_data)
+        
+        if tracks_list is not None and len(tracks_list) > 0:
+            try:
+                # Apply coordinate transformation (rotation + translation) like thesis FEP
+                transformed_tracks = self._transform_tracks(tracks_list)
+                
+                # Publish transformed tracks to the shared-memory ring, the fuser takes the newest frame
+                self.radar_ring.write(transformed_tracks, frame=frame_number, timestamp=time.time())
+                
+            except Exception as e:
+                self._log_exception('Transform error: %s', e)
+            
+            self.frame_count += 1
+            
+            if self.frame_count % 100 == 0:
+                self._log('Frames: %d, Tracks: %d, Errors: %d', self.frame_count, len(tracks_list), self.parse_errors)
+        
+        # Consume processed frame from buffer, resync past the magic word if it did not parse
+        if frame_length > 0:
+            self._read_pos += frame_length
+        else:
+            self._read_pos += len(MAGIC_WORD)
+        self._state = SEARCH_MAGIC
+
     def _parse_tlv_1010_frame(self, data):
         """
         Parse a single frame containing TLV 1010
+        data: memoryview into the receive buffer, headers are unpacked in place and TLV payloads stay views
         Returns: (tracks_list, frame_number, frame_length) or (None, 0, 0) on error
         """
         try:
             if len(data) < HEADER_LENGTH:
                 return None, 0, 0
             
-            # Parse header (40 bytes after magic word)
-            header = data[8:HEADER_LENGTH]
-            
-            version = struct.unpack('I', header[0:4])[0]
-            total_packet_len = struct.unpack('I', header[4:8])[0]
-            platform = struct.unpack('I', header[8:12])[0]
-            frame_number = struct.unpack('I', header[12:16])[0]
-            time_cpu_cycles = struct.unpack('I', header[16:20])[0]
-            num_detected_obj = struct.unpack('I', header[20:24])[0]
-            num_tlvs = struct.unpack('I', header[24:28])[0]
-            subframe_number = struct.unpack('I', header[28:32])[0]
+            # Parse header (32 bytes after magic word)
+            (version, total_packet_len, platform, frame_number, time_cpu_cycles,
+             num_detected_obj, num_tlvs, subframe_number) = FRAME_HEADER_STRUCT.unpack_from(data, len(MAGIC_WORD))
             
             if len(data) < total_packet_len:
                 return None, 0, 0
@@ -177,8 +298,7 @@ class RadarReader:
                 if tlv_start + 8 > len(data):
                     break
                 
-                tlv_type = struct.unpack('I', data[tlv_start:tlv_start+4])[0]
-                tlv_length = struct.unpack('I', data[tlv_start+4:tlv_start+8])[0]
+                tlv_type, tlv_length = TLV_HEADER_STRUCT.unpack_from(data, tlv_start)
                 tlv_data_start = tlv_start + 8
                 
                 # Check for TLV 1010 (3D Target List)
@@ -190,127 +310,70 @@ class RadarReader:
             return tracks, frame_number, total_packet_len
             
         except Exception as e:
-            self._log(f'Parse error: {e}')
+            self._log_exception('Parse error: %s', e)
             self.parse_errors += 1
             return None, 0, 0
 
     def _parse_tlv_1010_data(self, tlv_data):
         """
         Parse TLV 1010: 3D Target List
-        Each target: 112 bytes
+        Each target: 112 bytes, decoded by the JIT kernel into the preallocated target array
+        Returns: view of the first n entries, valid until the next frame is parsed
         """
-        TARGET_SIZE = 112
-        num_targets = len(tlv_data) // TARGET_SIZE
-        
-        tracks = []
-        
-        for i in range(num_targets):
-            offset = i * TARGET_SIZE
-            target_data = tlv_data[offset:offset + TARGET_SIZE]
-            
-            if len(target_data) < TARGET_SIZE:
-                break
-            
-            try:
-                tid = struct.unpack('I', target_data[0:4])[0]
-                
-                posX = struct.unpack('f', target_data[4:8])[0]
-                posY = struct.unpack('f', target_data[8:12])[0]
-                posZ = struct.unpack('f', target_data[12:16])[0]
-                
-                velX = struct.unpack('f', target_data[16:20])[0]
-                velY = struct.unpack('f', target_data[20:24])[0]
-                velZ = struct.unpack('f', target_data[24:28])[0]
-                
-                accX = struct.unpack('f', target_data[28:32])[0]
-                accY = struct.unpack('f', target_data[32:36])[0]
-                accZ = struct.unpack('f', target_data[36:40])[0]
-                
-                g = struct.unpack('f', target_data[104:108])[0]
-                confidence = struct.unpack('f', target_data[108:112])[0]
-                
-                track = {
-                    'tid': tid,
-                    'posX': posX, 'posY': posY, 'posZ': posZ,
-                    'velX': velX, 'velY': velY, 'velZ': velZ,
-                    'accX': accX, 'accY': accY, 'accZ': accZ,
-                    'gating_gain': g,
-                    'confidence': confidence
-                }
-                
-                tracks.append(track)
-                
-            except Exception as e:
-                self._log(f'Error parsing target {i}: {e}')
-                continue
-        
-        return tracks
+        buf_u8 = np.frombuffer(tlv_data, dtype=np.uint8)
+        targets = self._targets
+        n = parse_targets(buf_u8, targets['tid'], targets['pos'], targets['vel'], targets['acc'], targets['confidence'])
+        return self._filter_targets(targets[:n])
 
-    def _tracks_to_array(self, tracks_list):
+    def _filter_targets(self, targets):
         """
-        Convert track list to numpy array for transformation
-        Format: [posX, posY, posZ, velX, velY, velZ, accX, accY, accZ, confidence, tid]
+        Drop invalid targets in one columnar pass before the transform:
+        low confidence, non-finite values, or outside the radar's xlim/ylim/zlim (local view)
         """
-        track_array = []
-        for track in tracks_list:
-            row = [
-                track['posX'], track['posY'], track['posZ'],
-                track['velX'], track['velY'], track['velZ'],
-                track['accX'], track['accY'], track['accZ'],
-                track['confidence'],
-                track['tid']
-            ]
-            track_array.append(row)
-        
-        return np.array(track_array, dtype=np.float32)
+        mask = targets['confidence'] >= self.confidence_min
+        mask &= np.isfinite(targets['pos']).all(axis=1) & np.isfinite(targets['vel']).all(axis=1)
+        mask &= self.fep.FEP_boundary_idx_bool(targets['pos'])
+        if mask.all():
+            return targets
+        return targets[mask]
 
-    def _transform_tracks(self, track_array):
+    def _transform_tracks(self, targets):
         """
         Apply coordinate transformation using FEP (like thesis)
         
         Args:
-            track_array: numpy array (N, 11) - [posXYZ, velXYZ, accXYZ, confidence, tid]
+            targets: structured array (N,) of TRACK_DTYPE
         
         Returns:
-            list of transformed track dicts
+            structured array (N,) of TRACK_DTYPE in global coordinates, reused buffer valid until the next frame
         """
-        if len(track_array) == 0:
-            return []
+        # Identity transform, the parsed tracks are already global
+        if self._rotation_is_identity and self._translation_is_zero:
+            return targets
         
-        # Extract positions and velocities for transformation
-        positions = track_array[:, 0:3]  # posX, posY, posZ
-        velocities = track_array[:, 3:6]  # velX, velY, velZ
-        accelerations = track_array[:, 6:9]  # accX, accY, accZ
+        # Written into the reused output array, no per-frame allocation
+        transformed_tracks = self._transformed[:len(targets)]
+        transformed_tracks['tid'] = targets['tid']  # Original track ID
+        transformed_tracks['confidence'] = targets['confidence']
         
-        # Apply rotation (like thesis FEP)
-        pos_rotated = self.fep.FEP_trans_rotation_3D(positions)
-        vel_rotated = self.fep.FEP_trans_rotation_3D(velocities)  # Velocity also rotates
-        acc_rotated = self.fep.FEP_trans_rotation_3D(accelerations)  # Acceleration also rotates
-        
-        # Apply translation (like thesis FEP)
-        pos_transformed = self.fep.FEP_trans_position_3D(pos_rotated)
-        # Velocities and accelerations are vectors, no translation needed
-        
-        # Convert back to list of track dicts
-        transformed_tracks = []
-        for i in range(len(track_array)):
-            track = {
-                'tid': int(track_array[i, 10]),  # Original track ID
-                'posX': pos_transformed[i, 0],
-                'posY': pos_transformed[i, 1],
-                'posZ': pos_transformed[i, 2],
-                'velX': vel_rotated[i, 0],
-                'velY': vel_rotated[i, 1],
-                'velZ': vel_rotated[i, 2],
-                'accX': acc_rotated[i, 0],
-                'accY': acc_rotated[i, 1],
-                'accZ': acc_rotated[i, 2],
-                'confidence': track_array[i, 9],
-                'gating_gain': 1.0,
-                'radar_name': self.name
-            }
-            transformed_tracks.append(track)
+        if self._rotation_is_identity:
+            # Translation only, vectors pass through
+            np.add(targets['pos'], self._translation, out=transformed_tracks['pos'])
+            transformed_tracks['vel'] = targets['vel']
+            transformed_tracks['acc'] = targets['acc']
+            return transformed_tracks
         
+        if self._translation_is_zero:
+            # Rotation only, no homogeneous coordinates needed
+            np.matmul(targets['pos'], self._rotation_T, out=transformed_tracks['pos'])
+        else:
+            # Apply rotation + translation (like thesis FEP) as one affine matmul on homogeneous positions
+            pos_h = self._pos_h[:len(targets)]
+            pos_h[:, :3] = targets['pos']
+            np.matmul(pos_h, self._affine_T, out=transformed_tracks['pos'])
+        # Velocities and accelerations are vectors, rotation only
+        np.matmul(targets['vel'], self._rotation_T, out=transformed_tracks['vel'])
+        np.matmul(targets['acc'], self._rotation_T, out=transformed_tracks['acc'])
         return transformed_tracks
 
     def _read_cfg(self, cfg_file_name):
@@ -332,28 +395,30 @@ class RadarReader:
         for line in cfg_list:
             try:
                 cfg_port.write((line + '\n').encode())
-                time.sleep(0.05)
                 
-                # Read response
-                response = b''
-                timeout = time.time() + 1
-                while time.time() < timeout:
-                    if cfg_port.in_waiting > 0:
-                        response += cfg_port.read(cfg_port.in_waiting)
-                        break
-                    time.sleep(0.01)
+                # Read response, returns as soon as the CLI prompt is back (port timeout as upper bound)
+                response = cfg_port.read_until(CLI_PROMPT, size=1024)
                 
                 self._log(f'CFG: {line[:50]}... -> {response.decode("utf-8", errors="ignore").strip()}')
                 
             except Exception as e:
                 self._log(f'Config send error: {e}')
 
-    def _log(self, txt):
-        """Print with radar name prefix"""
-        print(f'[{self.name}]\t{txt}')
+    def _log(self, txt, *args):
+        """Log with radar name prefix, args are formatted lazily by logging"""
+        log.info(f'[{self.name}]\t{txt}', *args)
+
+    def _log_exception(self, txt, *args):
+        """Log with traceback, recurrent errors at most once per rate limit period"""
+        if self._exc_ratelimit.allow():
+            log.exception(f'[{self.name}]\t{txt} (%d suppressed)', *args, self._exc_ratelimit.suppressed)
+            self._exc_ratelimit.suppressed = 0
 
-    def __del__(self):
-        """Cleanup on exit"""
+    def close(self):
+        """Stop the radar and release the ports, runs once (called by the owner, atexit as a fallback)"""
+        if self._closed:
+            return
+        self._closed = True
         try:
             if self.cfg_port and self.cfg_port.is_open:
                 self.cfg_port.write(b'sensorStop\n')
@@ -361,11 +426,14 @@ class RadarReader:
                 self.cfg_port.close()
             if self.data_port and self.data_port.is_open:
                 self.data_port.close()
-        except:
+        except Exception:
             pass
         
         self._log(f"Closed. Frames: {self.frame_count}, Errors: {self.parse_errors}")
         self._log(f"Timestamp: {datetime.now().strftime('%Y-%m-%d_%H:%M:%S')}")
         
-        if self.name in self.status:
-            self.status[self.name] = False
\ No newline at end of file
+        try:
+            if self.name in self.status:
+                self.status[self.name] = False
+        except Exception:  # the manager may already be gone at interpreter exit
+            pass
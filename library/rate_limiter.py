@@ -0,0 +1,27 @@
+"""
+Designed for throttling repeated log output, abbr. RTL
+a recurrent error (e.g. a malformed frame every iteration) is logged at most once per period
+"""
+
+import time
+
+
+class RateLimiter:
+    def __init__(self, every=5.0):
+        """
+        :param every: (float) seconds between two allowed events
+        """
+        self.every_ns = int(every * 1e9)
+        self.next_ns = 0
+        self.suppressed = 0  # events refused since the last allowed one
+
+    def allow(self):
+        """
+        :return: (bool) True if the period has passed, suppressed is reset by the caller after reporting it
+        """
+        now_ns = time.monotonic_ns()
+        if now_ns < self.next_ns:
+            self.suppressed += 1
+            return False
+        self.next_ns = now_ns + self.every_ns
+        return True
@@ -0,0 +1,166 @@
+"""
+Designed for handing track frames between processes through shared memory, abbr. STR
+one producer writes structured-array frames into a ring of slots, readers take the latest frame without pickling
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+RING_HEADER_SIZE = 64  # bytes, global write counter (own cache line)
+SLOT_HEADER_DTYPE = np.dtype([('seq', '<u8'),  # seqlock: odd while the slot is being written
+                              ('n', '<u8'),  # number of rows in the slot
+                              ('frame', '<i8'),  # producer frame number
+                              ('timestamp', '<f8')])
+
+
+class SharedTrackRing:
+    def __init__(self, dtype, max_rows, n_slots=4, name=None, create=False):
+        """
+        create or attach a shared-memory ring of n_slots frames, each up to max_rows rows of dtype
+        :param dtype: (np.dtype) structured row dtype
+        :param max_rows: (int) rows per slot, longer frames are truncated
+        :param n_slots: (int) number of slots, a reader survives n_slots - 1 writes while copying
+        :param name: (str) shared memory name to attach to, None to generate one when creating
+        :param create: (bool) True in the owning process, False to attach
+        """
+        self.dtype = np.dtype(dtype)
+        self.max_rows = max_rows
+        self.n_slots = n_slots
+        headers_size = n_slots * SLOT_HEADER_DTYPE.itemsize
+        size = RING_HEADER_SIZE + headers_size + n_slots * max_rows * self.dtype.itemsize
+
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = self._attach(name)
+        self.name = self.shm.name
+        self.owner = create
+
+        # numpy views over the shared block
+        buf = self.shm.buf
+        self._count = np.ndarray((1,), dtype='<u8', buffer=buf, offset=0)
+        self._headers = np.ndarray((n_slots,), dtype=SLOT_HEADER_DTYPE, buffer=buf, offset=RING_HEADER_SIZE)
+        self._data = np.ndarray((n_slots, max_rows), dtype=self.dtype, buffer=buf,
+                                offset=RING_HEADER_SIZE + headers_size)
+        if create:
+            self._count[0] = 0
+            self._headers[:] = 0
+
+    @staticmethod
+    def _attach(name):
+        """attach to an existing segment, only the creating process unlinks it"""
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+        except TypeError:
+            # older Python registers it again with the resource tracker shared with the creator, which is harmless
+            return shared_memory.SharedMemory(name=name)
+
+    def __reduce__(self):
+        # pickled into child processes as an attach by name
+        return self.__class__, (self.dtype, self.max_rows, self.n_slots, self.name, False)
+
+    def write(self, rows, frame=0, timestamp=0.0):
+        """
+        publish one frame (single producer)
+        :param rows: (ndarray) structured array of self.dtype
+        :param frame: (int) frame number stored with the slot
+        :param timestamp: (float) timestamp stored with the slot
+        """
+        n = min(len(rows), self.max_rows)
+        count = int(self._count[0])
+        slot = count % self.n_slots
+        header = self._headers[slot:slot + 1]  # view, writes go to shared memory
+        seq = int(header['seq'][0])
+        header['seq'] = seq + 1  # odd, readers of this slot retry
+        self._data[slot, :n] = rows[:n]
+        header['n'] = n
+        header['frame'] = frame
+        header['timestamp'] = timestamp
+        header['seq'] = seq + 2  # even, slot consistent
+        self._count[0] = count + 1  # publish
+
+    def read_latest(self, last_count=0, retries=3):
+        """
+        copy out the newest frame if there is one newer than last_count
+        :param last_count: (int) count returned by the previous read, 0 for any
+        :param retries: (int) attempts when racing the producer
+        :return: (count, rows, frame, timestamp) or None if nothing new
+        """
+        for _ in range(retries):
+            count = int(self._count[0])
+            if count == 0 or count == last_count:
+                return None
+            slot = (count - 1) % self.n_slots
+            seq = int(self._headers['seq'][slot])
+            if seq & 1:
+                continue
+            n = int(self._headers['n'][slot])
+            frame = int(self._headers['frame'][slot])
+            timestamp = float(self._headers['timestamp'][slot])
+            rows = self._data[slot, :n].copy()
+            if int(self._headers['seq'][slot]) == seq:
+                return count, rows, frame, timestamp
+        return None
+
+    def close(self):
+        """release the views and detach, the owner also unlinks the segment"""
+        self._count = self._headers = self._data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+if __name__ == '__main__':
+    import pickle
+
+    # Self-check of the ring semantics
+    row_dtype = np.dtype([('tid', '<u4'), ('pos', '<f4', (3,))])
+    ring = SharedTrackRing(row_dtype, max_rows=4, n_slots=3, create=True)
+    reader = pickle.loads(pickle.dumps(ring))  # attach by name, as a child process would
+
+    def make_rows(first, n):
+        """n rows with tid first.., pos filled with the tid"""
+        rows = np.zeros(n, dtype=row_dtype)
+        rows['tid'] = np.arange(first, first + n)
+        rows['pos'] = rows['tid'][:, None]
+        return rows
+
+    try:
+        assert reader.read_latest() is None, 'empty ring returned a frame'
+
+        # round trip
+        ring.write(make_rows(1, 2), frame=7, timestamp=1.5)
+        count, rows, frame, timestamp = reader.read_latest()
+        assert (count, frame, timestamp) == (1, 7, 1.5)
+        assert np.array_equal(rows, make_rows(1, 2))
+        assert reader.read_latest(count) is None, 'same frame returned twice'
+
+        # wrap-around: only the newest frame is read, older slots are overwritten
+        for i in range(2, 2 + 2 * ring.n_slots):
+            ring.write(make_rows(10 * i, 3), frame=i)
+        count, rows, frame, _ = reader.read_latest(count)
+        assert count == 1 + 2 * ring.n_slots and frame == 1 + 2 * ring.n_slots
+        assert np.array_equal(rows, make_rows(10 * frame, 3))
+
+        # frames longer than max_rows are truncated
+        ring.write(make_rows(100, ring.max_rows + 2), frame=99)
+        count, rows, _, _ = reader.read_latest(count)
+        assert np.array_equal(rows, make_rows(100, ring.max_rows))
+
+        # the returned rows are a copy, a later write to the same slot does not change them
+        for i in range(ring.n_slots):
+            ring.write(make_rows(0, 1))
+        assert np.array_equal(rows, make_rows(100, ring.max_rows))
+
+        # torn read: a slot with an odd seq is being written and is rejected
+        count = int(ring._count[0])
+        slot = (count - 1) % ring.n_slots
+        ring._headers['seq'][slot] += 1
+        assert reader.read_latest() is None, 'torn slot was read'
+        ring._headers['seq'][slot] += 1
+        assert reader.read_latest()[0] == count
+        print('SharedTrackRing self-check passed')
+    finally:
+        reader.close()
+        ring.close()
@@ -2,12 +2,16 @@
 Designed to monitor and sync the queues, abbr. SCM
 """
 
+import atexit
+import logging
 from datetime import datetime
 from multiprocessing import Manager
 from time import sleep
 
 import numpy as np
 
+log = logging.getLogger(__name__)
+
 
 class SyncMonitor:
     def __init__(self, run_flag, radar_rd_queue_list, shared_param_dict, **kwargs_CFG):
@@ -36,6 +40,9 @@ class SyncMonitor:
         """
         self content
         """
+        # Explicit cleanup instead of a finalizer, see close()
+        self._closed = False
+        atexit.register(self.close)
         self._log('Start...')
 
     def run(self):
@@ -64,10 +71,16 @@ class SyncMonitor:
 
             sleep(2)
 
-    def _log(self, txt):  # print with device name
-        print(f'[{self.__class__.__name__}]\t{txt}')
+    def _log(self, txt, *args):  # log with device name
+        log.info(f'[{self.__class__.__name__}]\t{txt}', *args)
 
-    def __del__(self):
+    def close(self):  # runs once (called by the owner, atexit as a fallback)
+        if self._closed:
+            return
+        self._closed = True
         self._log(f"Closed. Timestamp: {datetime.now().strftime('%Y-%m-%d_%H:%M:%S')}")
-        self.status['Module_SCM'] = False
-        self.run_flag.value = False
\ No newline at end of file
+        try:
+            self.status['Module_SCM'] = False
+            self.run_flag.value = False
+        except Exception:  # the manager may already be gone at interpreter exit
+            pass
\ No newline at end of file
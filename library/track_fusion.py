@@ -3,9 +3,42 @@ Track Fusion Module for Dual Radar System
 Merges tracks from multiple radars into a single unified track list
 """
 
+import heapq
+import logging
+import os
+import sys
+import time
+from collections import deque
+
 import numpy as np
+from scipy.spatial import cKDTree
 from scipy.spatial.distance import cdist
-import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # run as a script
+from library.jit_kernels import group_neighbours, group_tracks
+
+log = logging.getLogger(__name__)
+
+# Above this many tracks neighbours come from a KD-tree, below it the dense distance matrix is cheaper
+KDTREE_MIN_TRACKS = 100
+
+# One fused track as it leaves the fusion (rows of a structured array, also the shared-memory ring layout)
+FUSED_DTYPE = np.dtype([('global_tid', '<i4'),
+                        ('pos', '<f4', (3,)),
+                        ('vel', '<f4', (3,)),
+                        ('acc', '<f4', (3,)),
+                        ('confidence', '<f4'),
+                        ('speed', '<f4'),  # |vel|, m/s
+                        ('num_radars', '<u1'),  # number of radar tracks merged into this one
+                        ('source_mask', '<u4')])  # bit i set: radar_names[i] detected it
+
+
+def _kinematics(tracks):
+    """
+    (N, 9) float32 view of the adjacent pos, vel, acc fields of a TRACK_DTYPE or FUSED_DTYPE array, no copy
+    """
+    return np.ndarray((len(tracks), 9), dtype='<f4', buffer=tracks,
+                      offset=tracks.dtype.fields['pos'][1], strides=(tracks.strides[0], 4))
 
 
 class TrackFusion:
@@ -15,6 +48,8 @@ class TrackFusion:
         """
         self.fusion_cfg = kwargs_CFG.get('TRACK_FUSION_CFG', {})
         self.radar_cfg_list = kwargs_CFG['RADAR_CFG_LIST']
+        self.radar_names = [cfg['name'] for cfg in self.radar_cfg_list]  # radar_idx / source_mask bit order
+        self._source_names_cache = {}  # source_mask -> tuple of radar names
         
         # Fusion parameters
         self.distance_threshold = self.fusion_cfg.get('distance_threshold', 0.5)  # meters
@@ -26,157 +61,209 @@ class TrackFusion:
         self.next_global_tid = 1
         self.radar_to_global_tid = {}  # Maps (radar_name, local_tid) -> global_tid
         self.global_tid_last_seen = {}  # Tracks when global IDs were last seen
+        self._global_to_keys = {}  # global_tid -> set of (radar_name, local_tid) mapped to it
+        self._expiry_heap = []  # (last_seen, global_tid), stale entries are skipped when popped
         self.tid_timeout = 2.0  # seconds
         
+        if group_tracks is not None:
+            # compile (or load from cache) now, not on the first frame
+            group_tracks(np.zeros((1, 3)), self.distance_threshold)
+            group_neighbours(np.array([0, 1], dtype=np.int64), np.zeros(1, dtype=np.int64))
+        
         self._log('Track Fusion initialized')
 
-    def fuse_tracks(self, radar_frames):
+    def fuse_tracks(self, radar_frames, now=None):
         """
         Fuse tracks from multiple radar frames
         
         Args:
             radar_frames: List of frame dicts from different radars
                          Each dict has: {'radar_name', 'tracks', 'timestamp', ...}
+                         'tracks' is a structured array with fields tid, pos, vel, acc, confidence
+            now: time.time() of this frame if the caller already has it, read here otherwise
         
         Returns:
-            fused_tracks: List of fused track dictionaries
+            fused_tracks: structured array of FUSED_DTYPE, one row per fused track
         """
         if not radar_frames:
-            return []
+            return np.zeros(0, dtype=FUSED_DTYPE)
+        
+        # One timestamp for the whole frame (cleanup and last-seen updates)
+        if now is None:
+            now = time.time()
         
         # Clean up old track IDs
-        self._cleanup_old_tids()
+        self._cleanup_old_tids(now)
+        
+        # Stack the tracks of all radars into one array, radar_idx tells which radar each row came from
+        all_tracks = np.concatenate([frame['tracks'] for frame in radar_frames])
+        if len(all_tracks) == 0:
+            return np.zeros(0, dtype=FUSED_DTYPE)
+        radar_idx = np.repeat([self._radar_idx(frame['radar_name']) for frame in radar_frames],
+                              [len(frame['tracks']) for frame in radar_frames])
         
-        # Extract all tracks with radar info
-        all_tracks = []
-        for frame in radar_frames:
-            radar_name = frame['radar_name']
-            for track in frame['tracks']: # Each track is list of dicts -> transformed tracks
-                track_copy = track.copy()
-                track_copy['radar_name'] = radar_name
-                track_copy['timestamp'] = frame['timestamp']
-                all_tracks.append(track_copy)
-            #     all_tracks = [
-            #     {'tid': 5, 'posX': 1.0, 'posY': 2.0, 'posZ': 1.5, 'radar_name': 'Radar1'},
-            #     {'tid': 7, 'posX': 3.0, 'posY': 4.0, 'posZ': 1.2, 'radar_name': 'Radar1'},
-            #     {'tid': 3, 'posX': 1.1, 'posY': 2.1, 'posZ': 1.4, 'radar_name': 'Radar2'}]
-        if not all_tracks:
-            return []
+        # Group the tracks within distance threshold, order lists the rows group by group
+        positions = all_tracks['pos'].astype(np.float64)
+        if group_tracks is not None and len(all_tracks) < KDTREE_MIN_TRACKS:
+            order, sizes = group_tracks(positions, self.distance_threshold)
+            return self._merge_groups(all_tracks, radar_idx, order.tolist(), sizes.tolist(), now)
         
-        # Build distance matrix between all tracks
-        positions = np.array([[t['posX'], t['posY'], t['posZ']] for t in all_tracks])
-        dist_matrix = cdist(positions, positions, metric='euclidean')
+        # Neighbours of row i are close_idx[bounds[i]:bounds[i + 1]]
+        bounds, close_idx = self._neighbours(positions)
+        if group_neighbours is not None:
+            order, sizes = group_neighbours(bounds, close_idx)
+            return self._merge_groups(all_tracks, radar_idx, order.tolist(), sizes.tolist(), now)
+        bounds, close_idx = bounds.tolist(), close_idx.tolist()
         
         # Find tracks to merge (within distance threshold)
-        fused_tracks = []
-        merged_indices = set()
+        order = []
+        sizes = []
+        merged = [False] * len(all_tracks)
         
-        for i, track_i in enumerate(all_tracks):
-            if i in merged_indices:
+        for i in range(len(all_tracks)):
+            if merged[i]:
                 continue
             
             # Find all tracks close to track_i
-            close_tracks_idx = np.where(dist_matrix[i, :] < self.distance_threshold)[0]
-            close_tracks = [all_tracks[idx] for idx in close_tracks_idx if idx not in merged_indices]
+            close_tracks_idx = close_idx[bounds[i]:bounds[i + 1]]
+            close_tracks_idx_free = [j for j in close_tracks_idx if not merged[j]]
             
-            if len(close_tracks) > 1:
+            if len(close_tracks_idx_free) > 1:
                 # Multiple tracks from different radars - fuse them
-                fused_track = self._merge_multiple_tracks(close_tracks)
-                fused_tracks.append(fused_track)
-                merged_indices.update(close_tracks_idx)
+                order.extend(close_tracks_idx_free)
+                sizes.append(len(close_tracks_idx_free))
+                for j in close_tracks_idx:
+                    merged[j] = True
             else:
-                # Single track - just assign global ID
-                fused_track = self._assign_global_tid(track_i)
-                fused_tracks.append(fused_track)
-                merged_indices.add(i)
+                # Single track - kept as is
+                order.append(i)
+                sizes.append(1)
+                merged[i] = True
         
-        return fused_tracks
+        return self._merge_groups(all_tracks, radar_idx, order, sizes, now)
 
-    def _merge_multiple_tracks(self, tracks):
+    def _neighbours(self, positions):
         """
-        Merge multiple tracks from different radars into one
-        Uses weighted average based on confidence
+        Find the tracks within distance_threshold of each track (itself included)
+        :param positions: (ndarray) float64 (N, 3)
+        :return: bounds: (ndarray) int64 (N + 1,) offsets into close_idx
+                 close_idx: (ndarray) int64 neighbour row indices, ascending per row
         """
-        if len(tracks) == 1:
-            return self._assign_global_tid(tracks[0])
-        
-        # Calculate weights based on confidence
-        confidences = np.array([t.get('confidence', 0.5) for t in tracks])
-        weights = confidences / np.sum(confidences)
-        
-        # Weighted average of positions
-        positions = np.array([[t['posX'], t['posY'], t['posZ']] for t in tracks])
-        fused_pos = np.average(positions, axis=0, weights=weights)
-        
-        # Weighted average of velocities
-        velocities = np.array([[t['velX'], t['velY'], t['velZ']] for t in tracks])
-        fused_vel = np.average(velocities, axis=0, weights=weights)
-        
-        # Weighted average of accelerations
-        accelerations = np.array([[t['accX'], t['accY'], t['accZ']] for t in tracks])
-        fused_acc = np.average(accelerations, axis=0, weights=weights)
+        n = len(positions)
+        if n < KDTREE_MIN_TRACKS:
+            # Squared distances against the squared threshold, same neighbours without N x N sqrt
+            dist_sq_matrix = cdist(positions, positions, metric='sqeuclidean')
+            rows, cols = np.nonzero(dist_sq_matrix < self.distance_threshold ** 2)
+        else:
+            # Only the close pairs are enumerated, no N x N matrix
+            pairs = cKDTree(positions).query_pairs(self.distance_threshold, output_type='ndarray')
+            # query_pairs keeps distance <= r, the dense path and the kernel use strict <
+            diff = positions[pairs[:, 0]] - positions[pairs[:, 1]]
+            pairs = pairs[np.einsum('ij,ij->i', diff, diff) < self.distance_threshold ** 2]
+            self_idx = np.arange(n)
+            rows = np.concatenate([pairs[:, 0], pairs[:, 1], self_idx])
+            cols = np.concatenate([pairs[:, 1], pairs[:, 0], self_idx])
+            order = np.lexsort((cols, rows))
+            rows, cols = rows[order], cols[order]
+        bounds = np.searchsorted(rows, np.arange(n + 1))
+        return bounds, cols.astype(np.int64)
+
+    def _merge_groups(self, all_tracks, radar_idx, order, sizes, now):
+        """
+        Merge each group of radar tracks into one fused track
+        Uses weighted average based on confidence, single tracks are copied
+        :param order: (list) row indices of all_tracks, group by group
+        :param sizes: (list) number of rows in each group
+        :param now: (float) frame timestamp, time.time()
+        """
+        fused_tracks = np.zeros(len(sizes), dtype=FUSED_DTYPE)
+        starts = np.cumsum([0] + sizes[:-1])
+        grouped = all_tracks[order]
+        grouped_radar_idx = radar_idx[order]
         
-        # Use maximum confidence
-        fused_confidence = np.max(confidences)
+        grouped_kinematics = _kinematics(grouped)
+        fused_kinematics = _kinematics(fused_tracks)
         
-        # Create fused track
-        fused_track = {
-            'posX': fused_pos[0],
-            'posY': fused_pos[1],
-            'posZ': fused_pos[2],
-            'velX': fused_vel[0],
-            'velY': fused_vel[1],
-            'velZ': fused_vel[2],
-            'accX': fused_acc[0],
-            'accY': fused_acc[1],
-            'accZ': fused_acc[2],
-            'confidence': fused_confidence,
-            'num_radars_detected': len(tracks),
-            'source_radars': [t['radar_name'] for t in tracks],
-            'source_tids': [(t['radar_name'], t['tid']) for t in tracks],
-            'timestamp': np.mean([t['timestamp'] for t in tracks])
-        }
+        if len(order) == len(sizes):
+            # No merges, every track keeps its values
+            fused_kinematics[:] = grouped_kinematics
+            fused_tracks['confidence'] = grouped['confidence']
+        else:
+            # Weighted averages of pos/vel/acc for all groups at once, the 9 columns in one pass
+            sizes_np = np.array(sizes)
+            multi = sizes_np > 1
+            weights = grouped['confidence'].astype(np.float64)
+            weight_sums = np.add.reduceat(weights, starts)
+            weighted = np.add.reduceat(grouped_kinematics * weights[:, None], starts, axis=0)
+            fused_kinematics[:] = grouped_kinematics[starts]  # single tracks
+            weighted_groups = multi & (weight_sums > 0)
+            fused_kinematics[weighted_groups] = weighted[weighted_groups] / weight_sums[weighted_groups, None]
+            # Groups whose confidences are all zero fall back to the plain mean, the rest of the frame is unaffected
+            unweighted_groups = multi & (weight_sums <= 0)
+            if unweighted_groups.any():
+                summed = np.add.reduceat(grouped_kinematics.astype(np.float64), starts, axis=0)
+                fused_kinematics[unweighted_groups] = summed[unweighted_groups] / sizes_np[unweighted_groups, None]
+            
+            # Use maximum confidence
+            fused_tracks['confidence'] = np.maximum.reduceat(grouped['confidence'], starts)
+        fused_tracks['speed'] = np.sqrt(np.einsum('ij,ij->i', fused_tracks['vel'], fused_tracks['vel']))
+        fused_tracks['num_radars'] = sizes
+        fused_tracks['source_mask'] = np.bitwise_or.reduceat(np.left_shift(1, grouped_radar_idx), starts)
         
-        # Assign global track ID
-        fused_track = self._assign_global_tid_multi(tracks, fused_track)
+        # Assign global track IDs
+        names = [self.radar_names[idx] for idx in grouped_radar_idx.tolist()]
+        keys = list(zip(names, grouped['tid'].tolist()))
+        fused_tracks['global_tid'] = [self._assign_global_tid(keys[start], now) if size == 1 else
+                                      self._assign_global_tid_multi(keys[start:start + size], now)
+                                      for start, size in zip(starts.tolist(), sizes)]
         
-        return fused_track
+        return fused_tracks
+
+    def source_radar_names(self, source_mask):
+        """
+        Names of the radars set in a fused track's source_mask, one shared (immutable) tuple per mask
+        """
+        names = self._source_names_cache.get(source_mask)
+        if names is None:
+            names = tuple(name for i, name in enumerate(self.radar_names) if source_mask >> i & 1)
+            self._source_names_cache[int(source_mask)] = names
+        return names
 
-    def _assign_global_tid(self, track):
+    def _radar_idx(self, radar_name):
         """
-        Assign a global track ID to a single radar track
+        Index of a radar in radar_names, radars missing from the config are appended
+        """
+        try:
+            return self.radar_names.index(radar_name)
+        except ValueError:
+            self.radar_names.append(radar_name)
+            return len(self.radar_names) - 1
+
+    def _assign_global_tid(self, key, now):
+        """
+        Assign a global track ID to a single radar track (radar_name, local_tid)
         Maintains consistency across frames
         """
-        radar_name = track['radar_name']
-        local_tid = track['tid']
-        key = (radar_name, local_tid)
-        
         if key in self.radar_to_global_tid:
             global_tid = self.radar_to_global_tid[key]
         else:
             global_tid = self.next_global_tid
-            self.radar_to_global_tid[key] = global_tid
+            self._map_key(key, global_tid)
             self.next_global_tid += 1
         
         # Update last seen time
-        self.global_tid_last_seen[global_tid] = time.time()
-        
-        track['global_tid'] = global_tid
-        track['num_radars_detected'] = 1
-        track['source_radars'] = [radar_name]
-        track['source_tids'] = [key]
+        self._touch(global_tid, now)
         
-        return track
+        return global_tid
 
-    def _assign_global_tid_multi(self, source_tracks, fused_track):
+    def _assign_global_tid_multi(self, source_keys, now):
         """
-        Assign global TID when fusing multiple tracks
+        Assign global TID when fusing multiple tracks (radar_name, local_tid)
         Tries to maintain existing global ID if any source track has one
         """
         # Check if any source track already has a global ID
         existing_global_tids = []
-        for track in source_tracks:
-            key = (track['radar_name'], track['tid'])
+        for key in source_keys:
             if key in self.radar_to_global_tid:
                 existing_global_tids.append(self.radar_to_global_tid[key])
         
@@ -189,33 +276,49 @@ class TrackFusion:
             self.next_global_tid += 1
         
         # Update mappings for all source tracks
-        for track in source_tracks:
-            key = (track['radar_name'], track['tid'])
-            self.radar_to_global_tid[key] = global_tid
+        for key in source_keys:
+            self._map_key(key, global_tid)
         
         # Update last seen
-        self.global_tid_last_seen[global_tid] = time.time()
+        self._touch(global_tid, now)
         
-        fused_track['global_tid'] = global_tid
-        return fused_track
+        return global_tid
 
-    def _cleanup_old_tids(self):
+    def _map_key(self, key, global_tid):
+        """Map a radar track (radar_name, local_tid) to global_tid, keeping the reverse index in step"""
+        old_tid = self.radar_to_global_tid.get(key)
+        if old_tid == global_tid:
+            return
+        if old_tid is not None:
+            self._global_to_keys[old_tid].discard(key)
+        self.radar_to_global_tid[key] = global_tid
+        self._global_to_keys.setdefault(global_tid, set()).add(key)
+
+    def _touch(self, global_tid, now):
+        """Mark global_tid as seen at now"""
+        if self.global_tid_last_seen.get(global_tid) == now:
+            return  # already seen in this frame
+        self.global_tid_last_seen[global_tid] = now
+        heapq.heappush(self._expiry_heap, (now, global_tid))
+
+    def _cleanup_old_tids(self, now):
         """Remove track IDs that haven't been seen recently"""
-        current_time = time.time()
-        old_tids = [tid for tid, last_seen in self.global_tid_last_seen.items()
-                    if current_time - last_seen > self.tid_timeout]
-        
-        for tid in old_tids:
+        heap = self._expiry_heap
+        # Only the expired entries are popped, oldest first
+        while heap and now - heap[0][0] > self.tid_timeout:
+            last_seen, tid = heapq.heappop(heap)
+            if self.global_tid_last_seen.get(tid) != last_seen:
+                continue  # seen again since, a newer entry is in the heap
+            
             # Remove from last_seen
             del self.global_tid_last_seen[tid]
             
             # Remove from mapping
-            keys_to_remove = [k for k, v in self.radar_to_global_tid.items() if v == tid]
-            for key in keys_to_remove:
+            for key in self._global_to_keys.pop(tid, ()):
                 del self.radar_to_global_tid[key]
 
-    def _log(self, txt):
-        print(f'[TrackFusion]\t{txt}')
+    def _log(self, txt, *args):
+        log.info(f'[TrackFusion]\t{txt}', *args)
 
 
 class TrackFusionVisualizer:
@@ -223,23 +326,18 @@ class TrackFusionVisualizer:
     Simple visualizer for fused tracks (optional, for debugging)
     """
     def __init__(self):
-        self.track_history = {}  # global_tid -> list of positions
+        self.track_history = {}  # global_tid -> deque of recent positions, oldest dropped on append
         self.max_history = 50
     
     def update(self, fused_tracks):
         """Update track history for visualization"""
-        for track in fused_tracks:
-            tid = track['global_tid']
-            pos = (track['posX'], track['posY'], track['posZ'])
+        for tid, pos in zip(fused_tracks['global_tid'].tolist(), fused_tracks['pos'].tolist()):
+            pos = tuple(pos)
             
             if tid not in self.track_history:
-                self.track_history[tid] = []
+                self.track_history[tid] = deque(maxlen=self.max_history)  # Keep only recent history
             
             self.track_history[tid].append(pos)
-            
-            # Keep only recent history
-            if len(self.track_history[tid]) > self.max_history:
-                self.track_history[tid].pop(0)
     
     def get_track_trails(self):
         """Get track trails for visualization"""
@@ -247,6 +345,10 @@ class TrackFusionVisualizer:
 
 
 if __name__ == '__main__':
+    from library.radar_reader_dual_1010 import TRACK_DTYPE
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     # Test track fusion
     fusion_cfg = {
         'TRACK_FUSION_CFG': {
@@ -261,32 +363,27 @@ if __name__ == '__main__':
     }
     
     fusion = TrackFusion(**fusion_cfg)
+
+    def make_tracks(rows):
+        """rows of (tid, pos, vel, acc, confidence) -> structured track array"""
+        return np.array(rows, dtype=TRACK_DTYPE)
     
     # Simulate two radar frames with overlapping tracks
     frame1 = {
         'radar_name': 'Radar1',
         'timestamp': time.time(),
-        'tracks': [
-            {'tid': 1, 'posX': 1.0, 'posY': 2.0, 'posZ': 1.5,
-             'velX': 0.1, 'velY': 0.2, 'velZ': 0.0,
-             'accX': 0.0, 'accY': 0.0, 'accZ': 0.0,
-             'confidence': 0.9},
-            {'tid': 2, 'posX': 3.0, 'posY': 4.0, 'posZ': 1.2,
-             'velX': -0.1, 'velY': 0.0, 'velZ': 0.0,
-             'accX': 0.0, 'accY': 0.0, 'accZ': 0.0,
-             'confidence': 0.7}
-        ]
+        'tracks': make_tracks([
+            (1, (1.0, 2.0, 1.5), (0.1, 0.2, 0.0), (0.0, 0.0, 0.0), 0.9),
+            (2, (3.0, 4.0, 1.2), (-0.1, 0.0, 0.0), (0.0, 0.0, 0.0), 0.7)
+        ])
     }
     
     frame2 = {
         'radar_name': 'Radar2',
         'timestamp': time.time(),
-        'tracks': [
-            {'tid': 5, 'posX': 1.1, 'posY': 2.1, 'posZ': 1.4,  # Close to Radar1 tid=1
-             'velX': 0.15, 'velY': 0.18, 'velZ': 0.0,
-             'accX': 0.0, 'accY': 0.0, 'accZ': 0.0,
-             'confidence': 0.85}
-        ]
+        'tracks': make_tracks([
+            (5, (1.1, 2.1, 1.4), (0.15, 0.18, 0.0), (0.0, 0.0, 0.0), 0.85)  # Close to Radar1 tid=1
+        ])
     }
     
     fused = fusion.fuse_tracks([frame1, frame2])
@@ -294,6 +391,14 @@ if __name__ == '__main__':
     print(f'\nFused {len(fused)} tracks:')
     for track in fused:
         print(f"  Global TID {track['global_tid']}: "
-              f"Pos=({track['posX']:.2f}, {track['posY']:.2f}, {track['posZ']:.2f}), "
+              f"Pos=({track['pos'][0]:.2f}, {track['pos'][1]:.2f}, {track['pos'][2]:.2f}), "
               f"Conf={track['confidence']:.2f}, "
-              f"Sources={track['source_radars']}")
\ No newline at end of file
+              f"Sources={fusion.source_radar_names(track['source_mask'])}")
+    
+    # Dense and KD-tree neighbour search agree on a pair exactly distance_threshold apart (not neighbours)
+    far = np.column_stack([np.arange(KDTREE_MIN_TRACKS) * 10.0 + 100.0, np.zeros((KDTREE_MIN_TRACKS, 2))])
+    edge = np.array([[0.0, 0.0, 0.0], [fusion.distance_threshold, 0.0, 0.0]])
+    for positions in (edge, np.vstack([edge, far])):
+        bounds, close_idx = fusion._neighbours(positions)
+        assert close_idx[bounds[0]:bounds[1]].tolist() == [0], 'pair at the threshold must not be fused'
+    print('Neighbour search: dense and KD-tree paths agree at the threshold')
@@ -2,8 +2,9 @@
 Designed for data visualization, abbr. VIS
 """
 
+import atexit
+import logging
 import math
-import queue
 import time
 from datetime import datetime
 from multiprocessing import Manager
@@ -13,6 +14,8 @@ import numpy as np
 from matplotlib import pyplot as plt
 from matplotlib.ticker import LinearLocator
 
+log = logging.getLogger(__name__)
+
 
 RP_colormap = ['C5', 'C7', 'C8']  # the colormap for radar raw points
 SNR_colormap = ['lavender', 'thistle', 'violet', 'darkorchid', 'indigo']  # the colormap for radar energy strength
@@ -20,13 +23,14 @@ OS_colormap = ['grey', 'green', 'gold', 'red']  # the colormap for object status
 
 
 class Visualizer:
-    def __init__(self, run_flag, vis_rd_queue, shared_param_dict, **kwargs_CFG):
+    def __init__(self, run_flag, vis_ring, shared_param_dict, **kwargs_CFG):
         """
         get shared values and queues
         """
         self.run_flag = run_flag
-        # fused track data in the queue
-        self.vis_rd_queue = vis_rd_queue
+        # fused track data in the shared-memory ring (SharedTrackRing of FUSED_DTYPE)
+        self.vis_ring = vis_ring
+        self._last_count = 0  # ring write count of the last frame taken
 
         self.status = shared_param_dict['proc_status_dict']
         self.status['Module_VIS'] = True
@@ -40,10 +44,12 @@ class Visualizer:
         self.VIS_ylim = VIS_CFG['VIS_ylim']
         self.VIS_zlim = VIS_CFG['VIS_zlim']
         self.text_list = []
+        self._last_signature = None  # fingerprint of the fused frame currently on screen
         self.auto_inactive_skip_frame = VIS_CFG['auto_inactive_skip_frame']
 
         """ other configs """
         self.RDR_CFG_LIST = kwargs_CFG['RADAR_CFG_LIST']
+        self._radar_xyz = np.array([RDR_CFG['pos_offset'] for RDR_CFG in self.RDR_CFG_LIST], dtype=np.float32).reshape(-1, 3)
 
         # setup for matplotlib plot
         matplotlib.use('TkAgg')  # set matplotlib backend
@@ -59,104 +65,146 @@ class Visualizer:
         # interactive mode on, no need plt.show()
         plt.ion()
 
+        # Explicit cleanup instead of a finalizer, see close()
+        self._closed = False
+        atexit.register(self.close)
         self._log('Start...')
 
     # module entrance
     def run(self):
         if self.dimension == '2D':
-            # create a plot
+            # create a plot, axes and artists are set up once and updated in place
             ax1 = self.fig.add_subplot(111)
+            ax1.set_xlim(self.VIS_xlim[0], self.VIS_xlim[1])
+            ax1.set_ylim(self.VIS_ylim[0], self.VIS_ylim[1])
+            ax1.xaxis.set_major_locator(LinearLocator(5))  # set axis scale
+            ax1.yaxis.set_major_locator(LinearLocator(5))
+            ax1.set_xlabel('x')
+            ax1.set_ylabel('y')
+            ax1.set_title('Radar')
+            self._init_canvas(ax1)
 
             while self.run_flag.value:
-                # clear and reset
-                plt.cla()
-                ax1.set_xlim(self.VIS_xlim[0], self.VIS_xlim[1])
-                ax1.set_ylim(self.VIS_ylim[0], self.VIS_ylim[1])
-                ax1.xaxis.set_major_locator(LinearLocator(5))  # set axis scale
-                ax1.yaxis.set_major_locator(LinearLocator(5))
-                ax1.set_xlabel('x')
-                ax1.set_ylabel('y')
-                ax1.set_title('Radar')
+                # skip the redraw when nothing new arrived, only keep the window responsive
+                fused_tracks = self._fetch_fused_tracks()
+                if fused_tracks is None:
+                    plt.pause(0.02)
+                    continue
                 # update the canvas
-                self._update_canvas(ax1)
+                self._update_canvas(ax1, fused_tracks)
 
         elif self.dimension == '3D':
-            # create a plot
+            # create a plot, axes and artists are set up once and updated in place
             ax1 = self.fig.add_subplot(111, projection='3d')
+            ax1.set_xlim(self.VIS_xlim[0], self.VIS_xlim[1])
+            ax1.set_ylim(self.VIS_ylim[0], self.VIS_ylim[1])
+            ax1.set_zlim(self.VIS_zlim[0], self.VIS_zlim[1])
+            ax1.xaxis.set_major_locator(LinearLocator(3))  # set axis scale
+            ax1.yaxis.set_major_locator(LinearLocator(3))
+            ax1.zaxis.set_major_locator(LinearLocator(3))
+            ax1.set_xlabel('x')
+            ax1.set_ylabel('y')
+            ax1.set_zlabel('z')
+            ax1.set_title('Radar')
+            self._init_canvas(ax1)
 
             spin = 0
             while self.run_flag.value:
-                # clear and reset
-                plt.cla()
-                ax1.set_xlim(self.VIS_xlim[0], self.VIS_xlim[1])
-                ax1.set_ylim(self.VIS_ylim[0], self.VIS_ylim[1])
-                ax1.set_zlim(self.VIS_zlim[0], self.VIS_zlim[1])
-                ax1.xaxis.set_major_locator(LinearLocator(3))  # set axis scale
-                ax1.yaxis.set_major_locator(LinearLocator(3))
-                ax1.zaxis.set_major_locator(LinearLocator(3))
-                ax1.set_xlabel('x')
-                ax1.set_ylabel('y')
-                ax1.set_zlabel('z')
-                ax1.set_title('Radar')
+                # skip the redraw when nothing new arrived, only keep the window responsive
+                fused_tracks = self._fetch_fused_tracks()
+                if fused_tracks is None:
+                    plt.pause(0.02)
+                    continue
                 # spin += 0.04
                 # ax1.view_init(ax1.elev - 0.5 * math.sin(spin), ax1.azim - 0.3 * math.sin(1.5 * spin))  # spin the view angle
                 # update the canvas
-                self._update_canvas(ax1)
+                self._update_canvas(ax1, fused_tracks)
         else:
             while self.run_flag.value:
                 for q in self.radar_rd_queue_list:
                     _ = q.get(block=True, timeout=5)
     
-    def _update_canvas(self, ax1):
+    def _fetch_fused_tracks(self):
+        """
+        get the newest fused frame from the ring, frames written in between are skipped
+        :return: fused_tracks: (ndarray) FUSED_DTYPE, see TrackFusion.fuse_tracks,
+                 None if nothing arrived or it is identical to the frame on screen
+        """
+        latest = self.vis_ring.read_latest(self._last_count)
+        if latest is None:
+            return None
+        self._last_count, fused_tracks, _, _ = latest
+
+        # fingerprint: track ids + positions quantized to mm
+        signature = (fused_tracks['global_tid'].tobytes(),
+                     np.round(fused_tracks['pos'] * 1000).astype(np.int32).tobytes())
+        if signature == self._last_signature:
+            return None
+        self._last_signature = signature
+        return fused_tracks
+
+    def _init_canvas(self, ax1):
+        """
+        create the artists once: radar positions, the fused track scatter and its labels
+        """
+        is_3d = self.dimension == '3D'
+        # Plot radar positions once, all radars in one artist
+        xyz = self._radar_xyz
+        if is_3d:
+            ax1.scatter(xyz[:, 0], xyz[:, 1], xyz[:, 2], marker='^', color='darkred', s=80)
+        else:
+            ax1.scatter(xyz[:, 0], xyz[:, 1], marker='^', color='darkred', s=80)
+        # fused tracks, offsets are replaced every frame
+        if is_3d:
+            self.scat = ax1.scatter([], [], [], c='limegreen', marker='o', s=60)
+        else:
+            self.scat = ax1.scatter([], [], c='limegreen', marker='o', s=60)
+        self.text_list = []  # one label per fused track, reused across frames
+
+    def _update_canvas(self, ax1, fused_tracks):
         """
         Efficient real-time 3D visualization of fused tracks (TLV 1010 output)
         """
+        is_3d = self.dimension == '3D'
+        pos = fused_tracks['pos']
+        xs, ys, zs = pos[:, 0], pos[:, 1], pos[:, 2]
 
-        # Try to get fused data (non-blocking, short timeout for smooth refresh)
-        try:
-            fused_tracks = self.vis_rd_queue.get(timeout=0.05)
-        except queue.Empty:
-            fused_tracks = []
-        
-        # Plot radar positions once
-        for RDR_CFG in self.RDR_CFG_LIST:
-            ax1.scatter(
-                [RDR_CFG['pos_offset'][0]],
-                [RDR_CFG['pos_offset'][1]],
-                [RDR_CFG['pos_offset'][2]],
-                marker='^', color='darkred', s=80
-            )
-        # If we have fused tracks, update scatter positions
-        if fused_tracks and len(fused_tracks) > 0:
-            xs = [t['posX'] for t in fused_tracks]
-            ys = [t['posY'] for t in fused_tracks]
-            zs = [t['posZ'] for t in fused_tracks]
-
-            # Update scatter points efficiently
-            # self.scat._offsets3d = (xs, ys, zs)
-            ax1.scatter(xs, ys, zs, c='limegreen', marker='o', s=60)
-
-            # Clear old labels and draw new ones
-            for txt in self.text_list:
-                try:
-                    txt.remove()
-                except Exception:
-                    pass
-            self.text_list.clear()
-
-            self.text_elems = []
-            for i, track in enumerate(fused_tracks):
-                self.text_elems.append(
-                    ax1.text(xs[i], ys[i], zs[i] + 0.1,
-                            f"T{track['global_tid']}", color='black', fontsize=8)
-                )
+        # Update scatter points in place
+        if is_3d:
+            self.scat._offsets3d = (xs, ys, zs)
         else:
-            # No data received recently
+            self.scat.set_offsets(pos[:, :2])
+
+        # Labels are only added or removed when the number of tracks changes
+        while len(self.text_list) > len(fused_tracks):
+            self.text_list.pop().remove()
+        while len(self.text_list) < len(fused_tracks):
+            if is_3d:
+                self.text_list.append(ax1.text(0, 0, 0, '', color='black', fontsize=8))
+            else:
+                self.text_list.append(ax1.text(0, 0, '', color='black', fontsize=8))
+        for txt, x, y, z, tid in zip(self.text_list, xs.tolist(), ys.tolist(), zs.tolist(),
+                                     fused_tracks['global_tid'].tolist()):
+            txt.set_text(f"T{tid}")
+            if is_3d:
+                txt.set_position_3d((x, y, z + 0.1))
+            else:
+                txt.set_position((x, y))
+
+        # Refresh visualization (non-blocking), only the figure is redrawn, no new artists
+        self.fig.canvas.draw_idle()
+        self.fig.canvas.flush_events()
+
+    def _log(self, txt, *args):  # log with device name
+        log.info(f'[{self.__class__.__name__}]\t{txt}', *args)
+
+    def close(self):  # runs once (called by the owner, atexit as a fallback)
+        if self._closed:
+            return
+        self._closed = True
+        self._log(f"Closed. Timestamp: {datetime.now().strftime('%Y-%m-%d_%H:%M:%S')}")
+        try:
+            self.status['Module_VIS'] = False
+        except Exception:  # the manager may already be gone at interpreter exit
             pass
-
-        # Refresh visualization (non-blocking)
-        plt.draw()
-        plt.pause(0.001)
-
-    def _log(self, txt):  # print with device name
-        print(f'[{self.__class__.__name__}]\t{txt}')
\ No newline at end of file
+        plt.close('all')
\ No newline at end of file
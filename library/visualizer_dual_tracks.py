@@ -3,23 +3,30 @@ Fuser for Dual Radar System - Track Fusion & Output
 Collects tracks from both radars, fuses them, and outputs to Industrial Visualizer
 """
 
+import atexit
+import logging
 import socket
 import struct
+import sys
 import time
 from datetime import datetime
 import numpy as np
 
+from library.radar_reader_dual_1010 import TARGET_DTYPE
+from library.rate_limiter import RateLimiter
 from library.track_fusion import TrackFusion
 
+log = logging.getLogger(__name__)
+
 
 class FuseDualRadar:
-    def __init__(self, run_flag, radar_rd_queue_list, vis_queue, shared_param_dict, **kwargs_CFG):
+    def __init__(self, run_flag, radar_ring_list, vis_ring, shared_param_dict, **kwargs_CFG):
         """
         Initialize visualizer for dual radar track fusion
         """
         self.run_flag = run_flag
-        self.radar_rd_queue_list = radar_rd_queue_list
-        self.vis_queue = vis_queue
+        self.radar_ring_list = radar_ring_list  # one SharedTrackRing of TRACK_DTYPE per radar, RADAR_CFG_LIST order
+        self.vis_ring = vis_ring  # SharedTrackRing of FUSED_DTYPE, latest fused frame for the visualizer
         self.status = shared_param_dict['proc_status_dict']
         self.status['Module_VIS'] = True
         
@@ -27,6 +34,7 @@ class FuseDualRadar:
         self.vis_cfg = kwargs_CFG['VISUALIZER_CFG']
         self.radar_cfg_list = kwargs_CFG['RADAR_CFG_LIST']
         self.ind_vis_cfg = kwargs_CFG.get('INDUSTRIAL_VIS_CFG', {})
+        self.debug = self.vis_cfg.get('debug', False)  # console track table every frame
         
         # Track fusion
         self.track_fusion = TrackFusion(**kwargs_CFG)
@@ -34,70 +42,100 @@ class FuseDualRadar:
         # Statistics
         self.frame_count = 0
         self.total_tracks_processed = 0
+        self._exc_ratelimit = RateLimiter(every=5.0)
+        
+        # Explicit cleanup instead of a finalizer, see close()
+        self._closed = False
+        atexit.register(self.close)
         
         self._log('Visualizer initialized for dual radar')
 
 
     def run(self):
         """
-        Main loop - collect frames from both radars, fuse tracks, and Send to Visualizer Queue
+        Main loop - collect frames from both radars, fuse tracks, and publish them to the Visualizer ring
         """
         self._log('Starting visualization loop...')
         
-        radar_frames_buffer = {cfg['name']: None for cfg in self.radar_cfg_list}
-        last_output_time = time.time()
-        output_period = 1.0 / 20  # 20 FPS output
+        radar_frames_buffer = [None] * len(self.radar_ring_list)  # newest frame per radar, ring / RADAR_CFG_LIST order
+        ring_counts = [0] * len(self.radar_ring_list)  # ring write count of the frame last taken per radar
+        output_period_ns = 1_000_000_000 // 20  # 20 FPS output, integer ns on the monotonic clock
+        next_output_ns = time.monotonic_ns() + output_period_ns
+        new_frame_count = 0  # frames received since the last fusion
         
         while self.run_flag.value:
             try:
-                # Collect frames from all radars
-                for i, queue in enumerate(self.radar_rd_queue_list):
-                    if not queue.empty():
-                        frame = queue.get(block=False)
-                        radar_name = frame['radar_name']
-                        radar_frames_buffer[radar_name] = frame
+                # Sleep until the next output is due, then take the newest frame of every radar from its ring
+                wait_ns = next_output_ns - time.monotonic_ns()
+                if wait_ns > 0:
+                    time.sleep(wait_ns / 1e9)
+                new_frame_count += self._read_rings(ring_counts, radar_frames_buffer)
                 
                 # Check if it's time to process and output
-                current_time = time.time()
-                if current_time - last_output_time >= output_period:
-                    # Get all available frames
-                    available_frames = [f for f in radar_frames_buffer.values() if f is not None]
+                now_ns = time.monotonic_ns()
+                if now_ns >= next_output_ns:
+                    # Get all available frames, only fuse again when a radar delivered something new
+                    available_frames = [f for f in radar_frames_buffer if f is not None]
                     
-                    if available_frames:
-                        # Fuse tracks from all radars
-                        fused_tracks = self.track_fusion.fuse_tracks(available_frames)
+                    if available_frames and new_frame_count > 0:
+                        new_frame_count = 0
+                        
+                        # Fuse tracks from all radars, one wall-clock read shared by fusion and the outputs
+                        now = time.time()
+                        fused_tracks = self.track_fusion.fuse_tracks(available_frames, now)
                         
-                        if fused_tracks:
+                        if len(fused_tracks):
                             # Output to Industrial Visualizer
-                            self._output_to_industrial_vis(fused_tracks)
+                            self._output_to_industrial_vis(fused_tracks, now)
                             
-                            self.vis_queue.put(fused_tracks)
+                            self.vis_ring.write(fused_tracks, frame=self.frame_count, timestamp=now)
 
                             # Print statistics
                             self.total_tracks_processed += len(fused_tracks)
                             self.frame_count += 1
                             
                             if self.frame_count % 100 == 0:
-                                self._log(f'Frames: {self.frame_count}, '
-                                         f'Tracks: {len(fused_tracks)}, '
-                                         f'Total: {self.total_tracks_processed}')
+                                self._log('Frames: %d, Tracks: %d, Total: %d',
+                                          self.frame_count, len(fused_tracks), self.total_tracks_processed)
                         
                         # Clear buffer (ready for next sync point)
-                        # radar_frames_buffer = {cfg['name']: None for cfg in self.radar_cfg_list}
+                        # radar_frames_buffer = [None] * len(self.radar_ring_list)
                     
-                    last_output_time = current_time
-                
-                # Small delay to prevent CPU spinning
-                time.sleep(0.001)
+                    # Advance by whole periods so output slots do not drift, resync if we fell behind
+                    next_output_ns += output_period_ns
+                    if next_output_ns <= now_ns:
+                        next_output_ns = now_ns + output_period_ns
                 
             except Exception as e:
-                self._log(f'Error in main loop: {e}')
+                self._log_exception('Error in main loop: %s', e)
                 time.sleep(0.01)
 
-    def _output_to_industrial_vis(self, fused_tracks):
+    def _read_rings(self, ring_counts, radar_frames_buffer):
+        """
+        Copy the newest frame of every radar ring into the buffer slot of that radar (frames written in between are skipped)
+        ring_counts: ring write count of the frame last taken per radar, updated in place
+        Returns: number of radars with a new frame
+        """
+        count = 0
+        for i, radar_ring in enumerate(self.radar_ring_list):
+            latest = radar_ring.read_latest(ring_counts[i])
+            if latest is None:
+                continue
+            ring_counts[i], tracks, frame_number, timestamp = latest
+            radar_name = self.radar_cfg_list[i]['name']
+            radar_frames_buffer[i] = {'radar_name': radar_name,
+                                      'frame_number': frame_number,
+                                      'num_tracks': len(tracks),
+                                      'tracks': tracks,
+                                      'timestamp': timestamp}
+            count += 1
+        return count
+
+    def _output_to_industrial_vis(self, fused_tracks, now):
         """
         Send fused tracks to Industrial Visualizer via socket
         Format: TLV structure compatible with Industrial Visualizer
+        now: time.time() of this frame
         """
         # if not self.socket_conn:
         #     return
@@ -119,7 +157,7 @@ class FuseDualRadar:
         #     total_packet_len = struct.pack('I', 40 + 8 + len(tlv_data))  # header + tlv_header + data
         #     platform = struct.pack('I', 0xA1843)  # IWR6843
         #     frame_number = struct.pack('I', self.frame_count)
-        #     time_cpu = struct.pack('I', int(time.time() * 1000))
+        #     time_cpu = struct.pack('I', int(now * 1000) & 0xFFFFFFFF)
         #     num_detected = struct.pack('I', len(fused_tracks))
         #     num_tlvs = struct.pack('I', 1)  # Only TLV 1010
         #     subframe = struct.pack('I', 0)
@@ -138,91 +176,87 @@ class FuseDualRadar:
         # except Exception as e:
         #     self._log(f'Output error: {e}')
 
-        # Clear screen for clean output (optional)
-        import os
-        os.system('cls' if os.name == 'nt' else 'clear')
+        if not self.debug:
+            return
         
-        print("="*70)
-        print(f"Frame {self.frame_count} | Time: {time.strftime('%H:%M:%S')}")
-        print(f"Total Tracks: {len(fused_tracks)}")
-        print("="*70)
+        # Clear screen for clean output, ANSI escape instead of spawning a shell every frame
+        # The whole table is built first and written at once
+        lines = ['\x1b[2J\x1b[H' + "="*70,
+                 f"Frame {self.frame_count} | Time: {time.strftime('%H:%M:%S', time.localtime(now))}",
+                 f"Total Tracks: {len(fused_tracks)}",
+                 "="*70]
         
-        for track in fused_tracks:
-            print(f"Track ID: {track['global_tid']:3d} | "
-                f"Pos: ({track['posX']:6.2f}, {track['posY']:6.2f}, {track['posZ']:6.2f}) | "
-                f"Vel: ({track['velX']:5.2f}, {track['velY']:5.2f}, {track['velZ']:5.2f}) | "
-                f"Conf: {track['confidence']:.2f} | "
-                f"Radars: {track.get('num_radars_detected', 1)}")
+        for global_tid, (posX, posY, posZ), (velX, velY, velZ), confidence, num_radars, source_mask in zip(
+                fused_tracks['global_tid'].tolist(), fused_tracks['pos'].tolist(), fused_tracks['vel'].tolist(),
+                fused_tracks['confidence'].tolist(), fused_tracks['num_radars'].tolist(),
+                fused_tracks['source_mask'].tolist()):
+            lines.append(f"Track ID: {global_tid:3d} | "
+                f"Pos: ({posX:6.2f}, {posY:6.2f}, {posZ:6.2f}) | "
+                f"Vel: ({velX:5.2f}, {velY:5.2f}, {velZ:5.2f}) | "
+                f"Conf: {confidence:.2f} | "
+                f"Radars: {num_radars}")
             
             # Show which radars detected this track
-            if 'source_radars' in track:
-                print(f"         └─ Detected by: {', '.join(track['source_radars'])}")
+            lines.append(f"         └─ Detected by: {', '.join(self.track_fusion.source_radar_names(source_mask))}")
         
-        print("="*70)
-        print()
+        lines.append("="*70)
+        lines.append('\n')
+        sys.stdout.write('\n'.join(lines))
+        sys.stdout.flush()
 
     def _build_tlv_1010(self, fused_tracks):
         """
-        Build TLV 1010 binary data from fused tracks
+        Build TLV 1010 binary data from fused tracks (structured array of FUSED_DTYPE)
         Each track: 112 bytes
         """
-        tlv_data = b''
-        
-        for track in fused_tracks:
-            # Pack each track (112 bytes)
-            tid = struct.pack('I', track['global_tid'])
-            
-            posX = struct.pack('f', track['posX'])
-            posY = struct.pack('f', track['posY'])
-            posZ = struct.pack('f', track['posZ'])
-            
-            velX = struct.pack('f', track['velX'])
-            velY = struct.pack('f', track['velY'])
-            velZ = struct.pack('f', track['velZ'])
-            
-            accX = struct.pack('f', track['accX'])
-            accY = struct.pack('f', track['accY'])
-            accZ = struct.pack('f', track['accZ'])
-            
-            # Error covariance (16 floats = 64 bytes) - zeros for now
-            ec = struct.pack('16f', *([0.0] * 16))
-            
-            # Gating gain
-            g = struct.pack('f', track.get('gating_gain', 1.0))
-            
-            # Confidence
-            confidence = struct.pack('f', track['confidence'])
-            
-            # Combine into single track
-            track_data = (tid + posX + posY + posZ + 
-                         velX + velY + velZ + 
-                         accX + accY + accZ + 
-                         ec + g + confidence)
-            
-            tlv_data += track_data
+        # One 112-byte record per track, the payload is the array buffer
+        targets = np.zeros(len(fused_tracks), dtype=TARGET_DTYPE)
+        targets['tid'] = fused_tracks['global_tid']
+        targets['pos'] = fused_tracks['pos']
+        targets['vel'] = fused_tracks['vel']
+        targets['acc'] = fused_tracks['acc']
+        targets['g'] = 1.0  # Gating gain, error covariance stays zero
+        targets['confidence'] = fused_tracks['confidence']
         
-        return tlv_data
+        return targets.tobytes()
 
-    def _log(self, txt):
-        """Print with module name"""
-        print(f'[Visualizer]\t{txt}')
+    def _log(self, txt, *args):
+        """Log with module name, args are formatted lazily by logging"""
+        log.info(f'[Visualizer]\t{txt}', *args)
 
-    def __del__(self):
-        """Cleanup on exit"""
-    
+    def _log_exception(self, txt, *args):
+        """Log with traceback, recurrent errors at most once per rate limit period"""
+        if self._exc_ratelimit.allow():
+            log.exception(f'[Visualizer]\t{txt} (%d suppressed)', *args, self._exc_ratelimit.suppressed)
+            self._exc_ratelimit.suppressed = 0
+
+    def close(self):
+        """Cleanup on exit, runs once (called by the owner, atexit as a fallback)"""
+        if self._closed:
+            return
+        self._closed = True
         self._log(f'Closed. Frames: {self.frame_count}, '
                  f'Total tracks: {self.total_tracks_processed}')
         self._log(f"Timestamp: {datetime.now().strftime('%Y-%m-%d_%H:%M:%S')}")
-        self.status['Module_VIS'] = False
+        try:
+            self.status['Module_VIS'] = False
+        except Exception:  # the manager may already be gone at interpreter exit
+            pass
 
 
 if __name__ == '__main__':
     # Test visualizer
-    from multiprocessing import Manager
+    from multiprocessing import Manager, Value
+    from library.radar_reader_dual_1010 import TRACK_DTYPE, TARGETS_MAX
+    from library.shared_track_ring import SharedTrackRing
+    from library.track_fusion import FUSED_DTYPE
     
-    run_flag = Manager().Value('b', True)
-    queue1 = Manager().Queue()
-    queue2 = Manager().Queue()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
+    run_flag = Value('b', True, lock=False)
+    ring1 = SharedTrackRing(TRACK_DTYPE, TARGETS_MAX, create=True)
+    ring2 = SharedTrackRing(TRACK_DTYPE, TARGETS_MAX, create=True)
+    vis_ring = SharedTrackRing(FUSED_DTYPE, 2 * TARGETS_MAX, create=True)
     shared_dict = {'proc_status_dict': Manager().dict()}
     
     # Test config
@@ -231,7 +265,8 @@ if __name__ == '__main__':
             'dimension': '3D',
             'VIS_xlim': (-5, 5),
             'VIS_ylim': (0, 10),
-            'VIS_zlim': (0, 3)
+            'VIS_zlim': (0, 3),
+            'debug': True
         },
         'RADAR_CFG_LIST': [
             {'name': 'Radar1'},
@@ -248,26 +283,22 @@ if __name__ == '__main__':
         }
     }
     
-    # vis = Visualizer(run_flag, [queue1, queue2], shared_dict, **kwargs_CFG)
+    vis = FuseDualRadar(run_flag, [ring1, ring2], vis_ring, shared_dict, **kwargs_CFG)
     
     # Simulate some test data
-    test_frame1 = {
-        'radar_name': 'Radar1',
-        'timestamp': time.time(),
-        'num_tracks': 1,
-        'tracks': [
-            {'tid': 1, 'posX': 1.0, 'posY': 2.0, 'posZ': 1.5,
-             'velX': 0.1, 'velY': 0.2, 'velZ': 0.0,
-             'accX': 0.0, 'accY': 0.0, 'accZ': 0.0,
-             'confidence': 0.9, 'gating_gain': 1.0}
-        ]
-    }
+    test_tracks1 = np.array([
+        (1, (1.0, 2.0, 1.5), (0.1, 0.2, 0.0), (0.0, 0.0, 0.0), 0.9)
+    ], dtype=TRACK_DTYPE)
     
-    queue1.put(test_frame1)
+    ring1.write(test_tracks1, frame=1, timestamp=time.time())
     
     print("Visualizer test - press Ctrl+C to stop")
     try:
         vis.run()
     except KeyboardInterrupt:
         print("\nStopping...")
-        run_flag.value = False
\ No newline at end of file
+        run_flag.value = False
+    finally:
+        vis.close()
+        for ring in (ring1, ring2, vis_ring):
+            ring.close()
\ No newline at end of file
@@ -3,22 +3,31 @@ Real-time 3D Matplotlib Visualizer (No UDP needed)
 Displays fused tracks in 3D plot with track trails
 """
 
+import atexit
+import logging
 import time
+from collections import deque
+from itertools import chain
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from mpl_toolkits.mplot3d import Axes3D
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 
-from library.track_fusion import TrackFusion
+from library.track_fusion import FUSED_DTYPE
+
+log = logging.getLogger(__name__)
 
 
 class MatplotlibVisualizer:
-    def __init__(self, run_flag, radar_rd_queue_list, shared_param_dict, **kwargs_CFG):
+    def __init__(self, run_flag, vis_ring, shared_param_dict, **kwargs_CFG):
         """
         Initialize matplotlib 3D visualizer
         """
         self.run_flag = run_flag
-        self.radar_rd_queue_list = radar_rd_queue_list
+        # fused track data in the shared-memory ring written by the fuser process (SharedTrackRing of FUSED_DTYPE)
+        self.vis_ring = vis_ring
+        self._last_count = 0  # ring write count of the last frame taken
         self.status = shared_param_dict['proc_status_dict']
         self.status['Module_VIS'] = True
         
@@ -26,17 +35,15 @@ class MatplotlibVisualizer:
         self.vis_cfg = kwargs_CFG['VISUALIZER_CFG']
         self.radar_cfg_list = kwargs_CFG['RADAR_CFG_LIST']
         
-        # Track fusion
-        self.track_fusion = TrackFusion(**kwargs_CFG)
-        
         # Visualization limits
         self.xlim = self.vis_cfg.get('VIS_xlim', (-5, 5))
         self.ylim = self.vis_cfg.get('VIS_ylim', (0, 10))
         self.zlim = self.vis_cfg.get('VIS_zlim', (0, 3))
+        self.redraw_period = self.vis_cfg.get('VIS_redraw_period', 1.0 / 20)  # seconds between repaints
         
         # Data storage
-        self.current_tracks = []
-        self.track_history = {}  # global_tid -> list of positions
+        self.current_tracks = np.zeros(0, dtype=FUSED_DTYPE)
+        self.track_history = {}  # global_tid -> deque of recent positions, oldest dropped on append
         self.max_history = 50
         
         # Statistics
@@ -48,6 +55,10 @@ class MatplotlibVisualizer:
         self.ax = None
         self.setup_plot()
         
+        # Explicit cleanup instead of a finalizer, see close()
+        self._closed = False
+        atexit.register(self.close)
+        
         self._log('Matplotlib 3D Visualizer initialized')
 
     def setup_plot(self):
@@ -73,7 +84,7 @@ class MatplotlibVisualizer:
         # View angle
         self.ax.view_init(elev=20, azim=45)
         
-        # Add ground plane
+        # Add ground plane (once, the axes are never cleared)
         xx, yy = np.meshgrid(
             np.linspace(self.xlim[0], self.xlim[1], 10),
             np.linspace(self.ylim[0], self.ylim[1], 10)
@@ -83,6 +94,36 @@ class MatplotlibVisualizer:
         
         # Add radar positions (if configured)
         self.plot_radar_positions()
+        
+        # Persistent track artists, updated in place by update_plot. When the canvas supports blitting they are
+        # animated (left out of the full draw) and blitted over the cached static background, otherwise they are
+        # ordinary artists redrawn by draw_idle
+        self._blit = self.fig.canvas.supports_blit
+        self._scatter_multi = self.ax.scatter([], [], [], c='green', marker='o', s=200, alpha=0.8,
+                                              edgecolors='black', linewidths=2, animated=self._blit)
+        self._scatter_single = self.ax.scatter([], [], [], c='blue', marker='o', s=100, alpha=0.8,
+                                               edgecolors='black', linewidths=2, animated=self._blit)
+        self._trails = Line3DCollection([], alpha=0.5, linewidth=2, animated=self._blit, visible=False)  # one segment per tid
+        self.ax.add_collection3d(self._trails, autolim=False)
+        self._label_pool = []  # Text3D labels, unused ones are hidden
+        self._quiver = None  # velocity vectors of the moving tracks, one collection
+        self._info_text = self.ax.text2D(0.05, 0.95, '', transform=self.ax.transAxes,
+                                         fontsize=12, verticalalignment='top', animated=self._blit,
+                                         bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.7))
+        
+        # Legend
+        legend_elements = [
+            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='green', 
+                      markersize=10, label='Multi-Radar'),
+            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', 
+                      markersize=10, label='Single Radar'),
+            plt.Line2D([0], [0], color='red', linewidth=2, label='Velocity')
+        ]
+        self.ax.legend(handles=legend_elements, loc='upper left')
+        
+        # Blitting: the background is re-captured on every full draw (first show, resize, view rotation)
+        self._background = None
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
 
     def plot_radar_positions(self):
         """Plot radar locations"""
@@ -91,62 +132,52 @@ class MatplotlibVisualizer:
             self.ax.scatter([pos[0]], [pos[1]], [pos[2]], 
                           c='red', marker='^', s=200, 
                           label=f"{radar_cfg['name']}", alpha=0.7)
-        self.ax.legend(loc='upper right')
+        self.ax.add_artist(self.ax.legend(loc='upper right'))
 
     def run(self):
         """
-        Main loop - get frames, fuse, and update plot
+        Main loop - take the newest fused frame from the ring and update plot
+        (fusion runs in the fuser process, a slow redraw here never delays it)
         """
         self._log('Starting visualization loop...')
         
-        radar_frames_buffer = {cfg['name']: None for cfg in self.radar_cfg_list}
-        last_output_time = time.time()
-        output_period = 1.0 / 20  # 20 FPS
+        redraw_period_ns = int(self.redraw_period * 1e9)
+        next_redraw_ns = time.monotonic_ns() + redraw_period_ns
         
         try:
             while self.run_flag.value:
-                # Collect frames from all radars
-                for i, queue in enumerate(self.radar_rd_queue_list):
-                    if not queue.empty():
-                        frame = queue.get(block=False)
-                        radar_name = frame['radar_name']
-                        radar_frames_buffer[radar_name] = frame
-                
-                # Check if it's time to update
-                current_time = time.time()
-                if current_time - last_output_time >= output_period:
-                    available_frames = [f for f in radar_frames_buffer.values() if f is not None]
+                # Newest fused frame, frames written since the last redraw are skipped
+                latest = self.vis_ring.read_latest(self._last_count)
+                if latest is not None:
+                    self._last_count, fused_tracks, _, _ = latest
                     
-                    if available_frames:
-                        # Fuse tracks
-                        fused_tracks = self.track_fusion.fuse_tracks(available_frames)
+                    if len(fused_tracks):
+                        self.current_tracks = fused_tracks
+                        self.update_track_history(fused_tracks)
+                        self.update_plot()
                         
-                        if fused_tracks:
-                            # Update visualization
-                            self.current_tracks = fused_tracks
-                            self.update_track_history(fused_tracks)
-                            self.update_plot()
-                            
-                            # Statistics
-                            self.total_tracks_processed += len(fused_tracks)
-                            self.frame_count += 1
-                            
-                            if self.frame_count % 100 == 0:
-                                self._log(f'Frames: {self.frame_count}, '
-                                         f'Tracks: {len(fused_tracks)}, '
-                                         f'Total: {self.total_tracks_processed}')
-                    
-                    last_output_time = current_time
+                        # Statistics
+                        self.total_tracks_processed += len(fused_tracks)
+                        self.frame_count += 1
+                        
+                        if self.frame_count % 100 == 0:
+                            self._log('Frames: %d, Tracks: %d, Total: %d',
+                                      self.frame_count, len(fused_tracks), self.total_tracks_processed)
                 
-                # Small delay
-                plt.pause(0.001)
+                # Keep the window responsive, then sleep until the next redraw slot
+                self.fig.canvas.flush_events()
+                now_ns = time.monotonic_ns()
+                if next_redraw_ns > now_ns:
+                    time.sleep((next_redraw_ns - now_ns) / 1e9)
+                # Advance by whole periods so redraw slots do not drift, resync if we fell behind
+                next_redraw_ns += redraw_period_ns
+                if next_redraw_ns <= now_ns:
+                    next_redraw_ns = now_ns + redraw_period_ns
                 
         except KeyboardInterrupt:
             self._log('Interrupted by user')
         except Exception as e:
-            self._log(f'Error: {e}')
-            import traceback
-            traceback.print_exc()
+            log.exception('[MatplotlibVis]\tError: %s', e)
         finally:
             plt.close(self.fig)
 
@@ -154,126 +185,122 @@ class MatplotlibVisualizer:
         """Update track position history for trails"""
         current_tids = set()
         
-        for track in fused_tracks:
-            tid = track['global_tid']
+        for tid, pos in zip(fused_tracks['global_tid'].tolist(), fused_tracks['pos'].tolist()):
             current_tids.add(tid)
-            pos = (track['posX'], track['posY'], track['posZ'])
+            pos = tuple(pos)
             
             if tid not in self.track_history:
-                self.track_history[tid] = []
+                self.track_history[tid] = deque(maxlen=self.max_history)  # Keep only recent history
             
             self.track_history[tid].append(pos)
-            
-            # Keep only recent history
-            if len(self.track_history[tid]) > self.max_history:
-                self.track_history[tid].pop(0)
         
         # Remove old tracks (not seen in last 2 seconds)
         old_tids = set(self.track_history.keys()) - current_tids
         for tid in old_tids:
             if len(self.track_history[tid]) > 10:  # Keep some history
-                self.track_history[tid].pop(0)
+                self.track_history[tid].popleft()
             else:
                 del self.track_history[tid]
 
     def update_plot(self):
-        """Update 3D plot with current tracks"""
-        # Clear previous data
-        self.ax.clear()
+        """Update 3D plot with current tracks, artists are updated in place instead of rebuilding the axes"""
+        tracks = self.current_tracks
+        pos = tracks['pos']
         
-        # Reset plot settings
-        self.ax.set_xlabel('X (meters)', fontsize=10)
-        self.ax.set_ylabel('Y (meters)', fontsize=10)
-        self.ax.set_zlabel('Z (meters)', fontsize=10)
-        self.ax.set_title(f'Dual Radar 3D Track Fusion | Frame {self.frame_count}', 
-                         fontsize=14, fontweight='bold')
-        self.ax.set_xlim(self.xlim)
-        self.ax.set_ylim(self.ylim)
-        self.ax.set_zlim(self.zlim)
-        self.ax.grid(True, alpha=0.3)
+        # Track trails, all in one collection: every point in one array, split into per-tid views
+        trails = [history for history in self.track_history.values() if len(history) > 1]
+        self._trails.set_visible(bool(trails))  # an empty collection cannot be projected
+        if trails:
+            lengths = [len(history) for history in trails]
+            points = np.fromiter(chain.from_iterable(chain.from_iterable(trails)), dtype=np.float32,
+                                 count=3 * sum(lengths)).reshape(-1, 3)
+            self._trails.set_segments(np.split(points, np.cumsum(lengths)[:-1]))
+            colors = plt.cm.rainbow(np.linspace(0, 1, len(self.track_history)))
+            self._trails.set_color([c for c, history in zip(colors, self.track_history.values()) if len(history) > 1])
         
-        # Ground plane
-        xx, yy = np.meshgrid(
-            np.linspace(self.xlim[0], self.xlim[1], 10),
-            np.linspace(self.ylim[0], self.ylim[1], 10)
-        )
-        zz = np.zeros_like(xx)
-        self.ax.plot_surface(xx, yy, zz, alpha=0.1, color='gray')
-        
-        # Plot radar positions
-        self.plot_radar_positions()
+        # Current tracks, colored by the number of radars that detected them
+        multi = tracks['num_radars'] >= 2
+        for scat, mask in ((self._scatter_multi, multi), (self._scatter_single, ~multi)):
+            scat._offsets3d = (pos[mask, 0], pos[mask, 1], pos[mask, 2])
         
-        # Plot track trails
-        colors = plt.cm.rainbow(np.linspace(0, 1, len(self.track_history)))
-        for i, (tid, history) in enumerate(self.track_history.items()):
-            if len(history) > 1:
-                history_array = np.array(history)
-                self.ax.plot(history_array[:, 0], 
-                           history_array[:, 1], 
-                           history_array[:, 2],
-                           color=colors[i], alpha=0.5, linewidth=2)
-        
-        # Plot current tracks
-        for track in self.current_tracks:
-            x, y, z = track['posX'], track['posY'], track['posZ']
-            tid = track['global_tid']
-            num_radars = track.get('num_radars_detected', 1)
-            confidence = track['confidence']
-            
-            # Color based on number of radars
-            if num_radars >= 2:
-                color = 'green'  # Detected by multiple radars
-                marker = 'o'
-                size = 200
-            else:
-                color = 'blue'  # Detected by single radar
-                marker = 'o'
-                size = 100
-            
-            # Plot track position
-            self.ax.scatter([x], [y], [z], c=color, marker=marker, 
-                          s=size, alpha=0.8, edgecolors='black', linewidths=2)
-            
-            # Add label
-            label = f"ID:{tid}\nC:{confidence:.2f}\nR:{num_radars}"
-            self.ax.text(x, y, z + 0.2, label, fontsize=8, 
-                        bbox=dict(boxstyle='round', facecolor='white', alpha=0.7))
-            
-            # Draw velocity vector
-            vx, vy, vz = track['velX'], track['velY'], track['velZ']
-            if np.sqrt(vx**2 + vy**2 + vz**2) > 0.05:  # Only if moving
-                self.ax.quiver(x, y, z, vx, vy, vz, 
-                             length=1.0, color='red', arrow_length_ratio=0.3, linewidth=2)
+        # Labels, the pool only grows, unused labels are hidden
+        while len(self._label_pool) < len(tracks):
+            self._label_pool.append(self.ax.text(0, 0, 0, '', fontsize=8, animated=self._blit,
+                                                 bbox=dict(boxstyle='round', facecolor='white', alpha=0.7)))
+        for txt, tid, (x, y, z), confidence, num_radars in zip(
+                self._label_pool, tracks['global_tid'].tolist(), pos.tolist(),
+                tracks['confidence'].tolist(), tracks['num_radars'].tolist()):
+            txt.set_text(f"ID:{tid}\nC:{confidence:.2f}\nR:{num_radars}")
+            txt.set_position_3d((x, y, z + 0.2))
+            txt.set_visible(True)
+        for txt in self._label_pool[len(tracks):]:
+            txt.set_visible(False)
         
-        # Add info text
-        info_text = (f"Tracks: {len(self.current_tracks)} | "
-                    f"Frame: {self.frame_count} | "
-                    f"Total: {self.total_tracks_processed}")
-        self.ax.text2D(0.05, 0.95, info_text, transform=self.ax.transAxes,
-                      fontsize=12, verticalalignment='top',
-                      bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.7))
+        # Velocity vectors of the moving tracks, one quiver for all of them
+        if self._quiver is not None:
+            self._quiver.remove()
+            self._quiver = None
+        moving = tracks['speed'] > 0.05
+        if moving.any():
+            p, v = pos[moving], tracks['vel'][moving]
+            self._quiver = self.ax.quiver(p[:, 0], p[:, 1], p[:, 2], v[:, 0], v[:, 1], v[:, 2],
+                                          length=1.0, color='red', arrow_length_ratio=0.3, linewidth=2,
+                                          animated=self._blit)
         
-        # Legend
-        legend_elements = [
-            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='green', 
-                      markersize=10, label='Multi-Radar'),
-            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', 
-                      markersize=10, label='Single Radar'),
-            plt.Line2D([0], [0], color='red', linewidth=2, label='Velocity')
-        ]
-        self.ax.legend(handles=legend_elements, loc='upper left')
+        # Info text
+        self._info_text.set_text(f"Tracks: {len(tracks)} | "
+                                 f"Frame: {self.frame_count} | "
+                                 f"Total: {self.total_tracks_processed}")
         
         # Draw
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
+        canvas = self.fig.canvas
+        if not self._blit:
+            canvas.draw_idle()
+            return
+        if self._background is None:
+            canvas.draw()  # full draw, _on_draw captures the background and draws the tracks
+        else:
+            canvas.restore_region(self._background)
+            self._draw_animated()
+        canvas.blit(self.fig.bbox)
+
+    def _animated_artists(self):
+        """:return: (list) the per-frame artists, drawn over the cached background"""
+        artists = [self._trails, self._scatter_multi, self._scatter_single, *self._label_pool]
+        if self._quiver is not None:
+            artists.append(self._quiver)
+        artists.append(self._info_text)
+        return artists
 
-    def _log(self, txt):
-        """Print with module name"""
-        print(f'[MatplotlibVis]\t{txt}')
+    def _draw_animated(self):
+        """draw the animated artists onto the canvas, 3D collections are projected first (Axes3D.draw is skipped)"""
+        for artist in self._animated_artists():
+            if artist.get_visible():
+                if hasattr(artist, 'do_3d_projection'):
+                    artist.do_3d_projection()
+                self.ax.draw_artist(artist)
 
-    def __del__(self):
-        """Cleanup on exit"""
+    def _on_draw(self, event):
+        """after a full draw: cache the static background and put the tracks back on top"""
+        canvas = self.fig.canvas
+        if not self._blit:
+            return
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _log(self, txt, *args):
+        """Log with module name, args are formatted lazily by logging"""
+        log.info(f'[MatplotlibVis]\t{txt}', *args)
+
+    def close(self):
+        """Cleanup on exit, runs once (called by the owner, atexit as a fallback)"""
+        if self._closed:
+            return
+        self._closed = True
         self._log(f'Closed. Frames: {self.frame_count}, '
                  f'Total tracks: {self.total_tracks_processed}')
-        self.status['Module_VIS'] = False
+        try:
+            self.status['Module_VIS'] = False
+        except Exception:  # the manager may already be gone at interpreter exit
+            pass
         plt.close('all')
\ No newline at end of file
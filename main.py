@@ -1,65 +1,162 @@
 
+import logging
+import os
+import signal
 import socket
-from multiprocessing import Process, Manager
-from time import sleep
+import multiprocessing
+from multiprocessing import Process, Manager, Value
+from threading import BrokenBarrierError, Thread, current_thread, main_thread
+from time import monotonic
 
 # Import modified modules
-from library.radar_reader_dual_1010 import RadarReader
+from library.radar_reader_dual_1010 import RadarReader, TARGETS_MAX, TRACK_DTYPE
+from library.shared_track_ring import SharedTrackRing
 from library.sync_monitor import SyncMonitor
-from library.visualizer import Visualizer
+from library.track_fusion import FUSED_DTYPE
 from library.visualizer_dual_tracks import FuseDualRadar
 
 # Choose visualizer type
 USE_MATPLOTLIB = False  # Set to False to use UDP output
-
-if USE_MATPLOTLIB:
-    from library.visualizer_matplotlib_3d import MatplotlibVisualizer as Visualizer
-else:
-    from library.visualizer_dual_tracks import FuseDualRadar
+STARTUP_TIMEOUT = 30  # seconds main waits for every module to be set up (radar config included)
+PIN_CPU_CORES = True  # Linux: give every module process its own core when there are enough cores
+SHUTDOWN_TIMEOUT = 2  # seconds the modules get to leave their loops and close() before they are terminated
 
 # Import configuration
 from cfg.config_demo_dual_radar import *
 
-def radar_proc_method(_run_flag, _radar_rd_queue, _shared_param_dict, **_kwargs_CFG):
+# Module logs go through logging (INFO by default), set the level here to quieten them
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+def _raise_system_exit(_signum, _frame):
+    raise SystemExit(0)
+def exit_on_sigterm():
+    """Process.terminate() sends SIGTERM, turn it into SystemExit so the finally blocks below still call close()"""
+    if current_thread() is main_thread():  # handlers can only be set from the main thread
+        signal.signal(signal.SIGTERM, _raise_system_exit)
+def wait_startup(_shared_param_dict, timeout=None):
+    """block until every module is set up (radars connected and configured, fuser and visualizer created)"""
+    try:
+        _shared_param_dict['startup_barrier'].wait(timeout)
+    except BrokenBarrierError:
+        return False  # a module failed or main timed out, the barrier releases everyone
+    return True
+def radar_proc_method(_run_flag, _radar_ring, _shared_param_dict, **_kwargs_CFG):
     """Process for each radar - reads and parses TLV 1010 data"""
-    radar = RadarReader(
-        run_flag=_run_flag,
-        radar_rd_queue=_radar_rd_queue,
-        shared_param_dict=_shared_param_dict,
-        **_kwargs_CFG
-    )
-    radar.run()
-def fuse_vis_dualradar(_run_flag, _radar_rd_queue_list, vis_queue, _shared_param_dict, **_kwargs_CFG):
+    exit_on_sigterm()
+    try:
+        radar = RadarReader(
+            run_flag=_run_flag,
+            radar_ring=_radar_ring,
+            shared_param_dict=_shared_param_dict,
+            **_kwargs_CFG
+        )
+    except BaseException:
+        _shared_param_dict['startup_barrier'].abort()  # release the modules waiting for this one
+        raise
+    try:
+        radar.run()
+    finally:
+        radar.close()  # process children exit without running atexit
+def radar_thread_group_proc_method(_run_flag, _radar_ring_list, _shared_param_dict, **_kwargs_CFG):
+    """Process hosting one reader thread per radar - parse/transform release the GIL"""
+    exit_on_sigterm()
+    radar_list = []
+    try:
+        try:
+            for RADAR_CFG, radar_ring in zip(_kwargs_CFG['RADAR_CFG_LIST'], _radar_ring_list):
+                kwargs_CFG = {
+                    'RADAR_CFG': RADAR_CFG,
+                    'FRAME_EARLY_PROCESSOR_CFG': _kwargs_CFG['FRAME_EARLY_PROCESSOR_CFG']
+                }
+                radar_list.append(RadarReader(
+                    run_flag=_run_flag,
+                    radar_ring=radar_ring,
+                    shared_param_dict=_shared_param_dict,
+                    **kwargs_CFG
+                ))
+        except BaseException:
+            _shared_param_dict['startup_barrier'].abort()  # release the modules waiting for these radars
+            raise
+        thread_list = []
+        for radar in radar_list:
+            radar_thread = Thread(
+                target=radar.run,
+                name=radar.name,
+                daemon=True
+            )
+            radar_thread.start()
+            thread_list.append(radar_thread)
+        for radar_thread in thread_list:
+            radar_thread.join()
+    finally:
+        # The reader threads are daemons and never reach a finally of their own on SIGTERM, close the radars here
+        for radar in radar_list:
+            radar.close()
+def fuse_vis_dualradar(_run_flag, _radar_ring_list, _vis_ring, _shared_param_dict, **_kwargs_CFG):
     """Fuser process - fuses tracks and outputs to Industrial Visualizer"""
-    fuser = FuseDualRadar(
-        run_flag=_run_flag,
-        radar_rd_queue_list=_radar_rd_queue_list,
-        vis_queue=vis_queue,
-        shared_param_dict=_shared_param_dict,
-        **_kwargs_CFG
-    )
-    fuser.run()
-def vis_proc_method(_run_flag, vis_queue, _shared_param_dict, **_kwargs_CFG):
+    exit_on_sigterm()
+    try:
+        fuser = FuseDualRadar(
+            run_flag=_run_flag,
+            radar_ring_list=_radar_ring_list,
+            vis_ring=_vis_ring,
+            shared_param_dict=_shared_param_dict,
+            **_kwargs_CFG
+        )
+    except BaseException:
+        _shared_param_dict['startup_barrier'].abort()  # release the modules waiting for this one
+        raise
+    wait_startup(_shared_param_dict)
+    try:
+        fuser.run()
+    finally:
+        fuser.close()  # process children exit without running atexit
+def vis_proc_method(_run_flag, _vis_ring, _shared_param_dict, **_kwargs_CFG):
     """Visualization process - fuses tracks and outputs to Industrial Visualizer"""
-    vis = Visualizer(
-        run_flag=_run_flag,
-        vis_rd_queue=vis_queue,
-        shared_param_dict=_shared_param_dict,
-        **_kwargs_CFG
-    )
-    vis.run()
+    exit_on_sigterm()
+    try:
+        # matplotlib is only imported in this process, the other workers start without it
+        if USE_MATPLOTLIB:
+            from library.visualizer_matplotlib_3d import MatplotlibVisualizer as Visualizer
+        else:
+            from library.visualizer import Visualizer
+        vis = Visualizer(
+            run_flag=_run_flag,
+            vis_ring=_vis_ring,
+            shared_param_dict=_shared_param_dict,
+            **_kwargs_CFG
+        )
+    except BaseException:
+        _shared_param_dict['startup_barrier'].abort()  # release the modules waiting for this one
+        raise
+    wait_startup(_shared_param_dict)
+    try:
+        vis.run()
+    finally:
+        vis.close()  # process children exit without running atexit
 def monitor_proc_method(_run_flag, _radar_rd_queue_list, _shared_param_dict, **_kwargs_CFG):
     """Monitor process - syncs queues between radars"""
+    exit_on_sigterm()
     sync = SyncMonitor(
         run_flag=_run_flag,
         radar_rd_queue_list=_radar_rd_queue_list,
         shared_param_dict=_shared_param_dict,
         **_kwargs_CFG
     )
-    sync.run()
+    try:
+        sync.run()
+    finally:
+        sync.close()  # process children exit without running atexit
 
 
 if __name__ == '__main__':
+    # POSIX: workers fork from a small server process with the worker modules preloaded
+    # instead of copying this process (Windows always spawns)
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method('forkserver', force=True)
+        multiprocessing.set_forkserver_preload(['numpy', 'library.radar_reader_dual_1010',
+                                                'library.visualizer_dual_tracks'])
+    
     print("="*70)
     print("DUAL IWR6843AOP 3D PEOPLE TRACKING SYSTEM")
     print(f"Experiment: {EXPERIMENT_NAME}")
@@ -67,27 +164,31 @@ if __name__ == '__main__':
     print("="*70)
     
     # Generate shared variables between processes
-    run_flag = Manager().Value('b', True)
-    
-    shared_param_dict = {'mansave_flag'       : Manager().Value('c', None),  # set as None, 'image' or 'video', only triggered at the end of recording
-                         'autosave_flag'      : Manager().Value('b', False),  # set as False, True or False, constantly high from the beginning to the end of recording
-                         'compress_video_file': Manager().Value('c', None),  # the record video file waiting to be compressed
-                         'email_image'        : Manager().Value('f', None),  # for image info from save_center to email_notifier module
-                         'proc_status_dict'   : Manager().dict(),  # for process status
-                         'save_queue'         : Manager().Queue(maxsize=2000)
+    run_flag = Value('b', True, lock=False)  # a byte in shared memory, every loop iteration reads it without IPC
+    
+    # All proxies come from one manager server (each Manager() call starts its own process)
+    manager = Manager()
+    shared_param_dict = {'mansave_flag'       : manager.Value('c', None),  # set as None, 'image' or 'video', only triggered at the end of recording
+                         'autosave_flag'      : manager.Value('b', False),  # set as False, True or False, constantly high from the beginning to the end of recording
+                         'compress_video_file': manager.Value('c', None),  # the record video file waiting to be compressed
+                         'email_image'        : manager.Value('f', None),  # for image info from save_center to email_notifier module
+                         'proc_status_dict'   : manager.dict(),  # for process status
+                         'save_queue'         : manager.Queue(maxsize=2000),
+                         'startup_barrier'    : manager.Barrier(len(RADAR_CFG_LIST) + 3),  # radar readers, fuser, visualizer and main
                          }
     
-    # Generate shared queues and processes for each radar
-    radar_rd_queue_list = []
+    # Generate shared memory rings and processes for each radar
+    # Each radar publishes its transformed tracks into its own ring (no pickling), the fuser reads the newest frame
+    radar_ring_list = [SharedTrackRing(TRACK_DTYPE, max_rows=TARGETS_MAX, create=True) for _ in RADAR_CFG_LIST]
+    # Fused tracks go to the visualizer through shared memory (no pickling), the fuser overwrites the oldest slot
+    vis_ring = SharedTrackRing(FUSED_DTYPE, max_rows=TARGETS_MAX * len(RADAR_CFG_LIST), create=True)
     proc_list = []
     
     print("\nInitializing radars...")
     for i, RADAR_CFG in enumerate(RADAR_CFG_LIST):
-        
-        radar_rd_queue = Manager().Queue() # Queue for radar data has frames dict types
-        vis_queue      = Manager().Queue()
 
-        radar_rd_queue_list.append(radar_rd_queue)
+        if RADAR_READER_THREADED:
+            continue
         # Create config for this radar
         kwargs_CFG = {
             'RADAR_CFG': RADAR_CFG,
@@ -96,12 +197,23 @@ if __name__ == '__main__':
         # Create process for this radar
         radar_proc = Process(
             target=radar_proc_method,
-            args=(run_flag, radar_rd_queue, shared_param_dict),
+            args=(run_flag, radar_ring_list[i], shared_param_dict),
             kwargs=kwargs_CFG,
             name=RADAR_CFG['name']
         )
         proc_list.append(radar_proc)
     
+    # Or one process running every radar reader as a thread
+    if RADAR_READER_THREADED:
+        radar_proc = Process(
+            target=radar_thread_group_proc_method,
+            args=(run_flag, radar_ring_list, shared_param_dict),
+            kwargs={'RADAR_CFG_LIST': RADAR_CFG_LIST,
+                    'FRAME_EARLY_PROCESSOR_CFG': FRAME_EARLY_PROCESSOR_CFG},
+            name='Module_RDR'
+        )
+        proc_list.append(radar_proc)
+    
     # # Configuration for visualizer and monitor
     kwargs_CFG = {'VISUALIZER_CFG'          : VISUALIZER_CFG,
                   'RADAR_CFG_LIST'          : RADAR_CFG_LIST,
@@ -130,7 +242,7 @@ if __name__ == '__main__':
     print("\nInitializing visualizer...")
     vis_proc = Process(
         target=vis_proc_method,
-        args=(run_flag, vis_queue, shared_param_dict),
+        args=(run_flag, vis_ring, shared_param_dict),
         kwargs=kwargs_CFG,
         name='Module_VIS'
     )
@@ -140,7 +252,7 @@ if __name__ == '__main__':
     print("\nInitializing Fuser...")
     fuser_proc = Process(
         target=fuse_vis_dualradar,
-        args=(run_flag, radar_rd_queue_list, vis_queue, shared_param_dict),
+        args=(run_flag, radar_ring_list, vis_ring, shared_param_dict),
         kwargs=kwargs_CFG,
         name='Module_FUS'
     )
@@ -159,7 +271,20 @@ if __name__ == '__main__':
     for proc in proc_list:
         print(f"Starting {proc.name}...")
         proc.start()
-        sleep(0.5)
+    # One core per module so the hot loops are not migrated between cores, main and the managers keep the rest
+    # (the threaded reader process gets one core per radar, its parse kernels run in parallel)
+    if PIN_CPU_CORES and hasattr(os, 'sched_setaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+        widths = [len(RADAR_CFG_LIST) if proc.name == 'Module_RDR' else 1 for proc in proc_list]
+        if len(cores) > sum(widths):
+            free_cores = cores[-sum(widths):]
+            for proc, width in zip(proc_list, widths):
+                proc_cores, free_cores = set(free_cores[:width]), free_cores[width:]
+                os.sched_setaffinity(proc.pid, proc_cores)
+                print(f"{proc.name} pinned to CPU {sorted(proc_cores)}")
+    # Every module passes the barrier once it is ready, no fixed delay between the starts
+    if not wait_startup(shared_param_dict, STARTUP_TIMEOUT):
+        print("Warning: not every module started, see the log above")
     
     print("\n" + "="*70)
     print("SYSTEM RUNNING - Press Ctrl+C to stop")
@@ -177,8 +302,10 @@ if __name__ == '__main__':
         print("="*70)
         run_flag.value = False
         
-        # Give processes time to cleanup
-        sleep(2)
+        # Give processes time to cleanup, only as long as the slowest one needs
+        deadline = monotonic() + SHUTDOWN_TIMEOUT
+        for proc in proc_list:
+            proc.join(timeout=max(0.0, deadline - monotonic()))
         
         # Force terminate if still running
         for proc in proc_list:
@@ -187,6 +314,10 @@ if __name__ == '__main__':
                 proc.terminate()
                 proc.join(timeout=1)
     
+    # Release the shared memory segments
+    for ring in radar_ring_list + [vis_ring]:
+        ring.close()
+    
     print("\n" + "="*70)
     print("SYSTEM STOPPED")
     print("="*70)
\ No newline at end of file